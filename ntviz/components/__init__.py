@@ -6,3 +6,5 @@ from .executor import *
 from .manager import *
 from .persona import *
 from .analysis import Analyzer
+from .tables import MultiTableDataset
+from .cleaner import DataCleaner
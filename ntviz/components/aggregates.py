@@ -0,0 +1,75 @@
+import logging
+from typing import Dict, List, Union
+
+import pandas as pd
+
+logger = logging.getLogger("ntviz")
+
+# aggregations computed for every numeric column whenever a grouping is first requested
+CUBE_AGGREGATIONS = ["count", "sum", "mean", "median", "min", "max", "std"]
+
+
+class AggregateCache(object):
+    """Lazily computed, memoized group-by aggregates of a dataset"""
+
+    def __init__(self, data: pd.DataFrame) -> None:
+        """
+        Initialize an empty aggregate cache for a dataset.
+
+        Args:
+            data (pd.DataFrame): The dataset to aggregate.
+        """
+        self.data = data
+        self.numeric_columns = [
+            column for column in data.columns
+            if pd.api.types.is_numeric_dtype(data[column]) and not pd.api.types.is_bool_dtype(data[column])]
+        self.cubes: Dict[tuple, pd.DataFrame] = {}
+        self.results: Dict[tuple, pd.DataFrame] = {}
+
+    def cube(self, by: Union[str, List[str]]) -> pd.DataFrame:
+        """
+        Get every cube aggregation of every numeric column grouped by some columns.
+        The cube is computed in a single group-by on first use and memoized.
+
+        Args:
+            by (Union[str, List[str]]): Column(s) to group by.
+
+        Returns:
+            pd.DataFrame: Aggregates indexed by the group keys, with (column, aggregation) columns.
+        """
+        by = (by,) if isinstance(by, str) else tuple(by)
+        if by not in self.cubes:
+            logger.info(f"Computing aggregate cube by {by}")
+            columns = [column for column in self.numeric_columns if column not in by]
+            self.cubes[by] = self.data.groupby(list(by), observed=True)[columns].agg(CUBE_AGGREGATIONS)
+        return self.cubes[by]
+
+    def aggregate(self, by: Union[str, List[str]], value: str = None, agg: str = "mean") -> pd.DataFrame:
+        """
+        Aggregate a column by some columns, e.g. aggregate("Type", "Retail_Price", "mean").
+        Repeated requests are answered from the cache.
+
+        Args:
+            by (Union[str, List[str]]): Column(s) to group by.
+            value (str, optional): Column to aggregate. Rows are counted if None.
+            agg (str, optional): Aggregation such as count, sum, mean, median, min, max, std or nunique.
+                Defaults to "mean".
+
+        Returns:
+            pd.DataFrame: One row per group with the group columns and the aggregated value column.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        key = (tuple(by), value, agg if value is not None else "count")
+        if key in self.results:
+            return self.results[key].copy()
+
+        if value is None:
+            result = self.data.groupby(by, observed=True).size().rename("count")
+        elif value in self.numeric_columns and value not in by and agg in CUBE_AGGREGATIONS:
+            result = self.cube(by)[(value, agg)].rename(value)
+        else:
+            result = self.data.groupby(by, observed=True)[value].agg(agg).rename(value)
+
+        self.results[key] = result.reset_index()
+        # generated code may modify the result in place
+        return self.results[key].copy()
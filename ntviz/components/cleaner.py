@@ -0,0 +1,87 @@
+import logging
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from ntviz.datacache import (dataframe_fingerprint, hash_rows, load_cached_frame, load_cached_json,
+                             save_cached_frame, save_cached_json)
+
+logger = logging.getLogger("ntviz")
+
+
+class DataCleaner(object):
+    """Fill missing numeric values and drop duplicate rows, once per dataset"""
+
+    def __init__(self, max_cached: int = 8) -> None:
+        """
+        Args:
+            max_cached (int, optional): Cleaned datasets kept in memory. The least recently used ones are
+                evicted and read back from the disk cache. Defaults to 8.
+        """
+        self.max_cached = max_cached
+        self.cleaned: "OrderedDict[str, tuple]" = OrderedDict()
+        # a cleaner can be shared by concurrent sessions
+        self.lock = threading.Lock()
+
+    def clean(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Clean a DataFrame by filling missing numeric values with the column mean and removing duplicate rows.
+        Results are cached in memory and on disk by the dataset fingerprint, so cleaning the same data
+        again is a lookup.
+
+        Args:
+            df (pd.DataFrame): The dataset to clean.
+
+        Returns:
+            pd.DataFrame: The cleaned dataset.
+        """
+        return self.clean_with_report(df)[0]
+
+    def clean_with_report(self, df: pd.DataFrame) -> tuple:
+        """
+        Clean a DataFrame like clean, also returning what was cleaned.
+
+        Args:
+            df (pd.DataFrame): The dataset to clean.
+
+        Returns:
+            tuple: The cleaned dataset and a report {"missing_values": int, "duplicates": int}.
+        """
+        row_hashes = hash_rows(df)
+        fingerprint = dataframe_fingerprint(df, row_hashes)
+
+        with self.lock:
+            if fingerprint in self.cleaned:
+                self.cleaned.move_to_end(fingerprint)
+                return self.cleaned[fingerprint]
+
+        cleaned_df, report = load_cached_frame(fingerprint), load_cached_json(fingerprint, namespace="cleaning")
+        if cleaned_df is None or report is None:
+            cleaned_df, report = self._clean(df, row_hashes)
+            save_cached_frame(fingerprint, cleaned_df)
+            save_cached_json(fingerprint, report, namespace="cleaning")
+
+        with self.lock:
+            self.cleaned[fingerprint] = (cleaned_df, report)
+            self.cleaned.move_to_end(fingerprint)
+            while len(self.cleaned) > self.max_cached:
+                self.cleaned.popitem(last=False)
+        return cleaned_df, report
+
+    def _clean(self, df: pd.DataFrame, row_hashes: pd.Series) -> tuple:
+        # impute every numeric column in a single vectorized pass
+        numeric_df = df.select_dtypes(include=["number"])
+        missing_values = int(numeric_df.isnull().sum().sum())
+        if missing_values:
+            df = df.fillna(numeric_df.mean())
+            row_hashes = hash_rows(df)
+
+        # detect duplicate rows by their hashes instead of comparing full rows
+        duplicated = row_hashes.duplicated().values
+        duplicates = int(duplicated.sum())
+        if duplicates:
+            df = df[~duplicated]
+
+        logger.info(f"Cleaned dataset: filled {missing_values} missing values, dropped {duplicates} duplicates")
+        return df, {"missing_values": missing_values, "duplicates": duplicates}
@@ -0,0 +1,133 @@
+import logging
+from dataclasses import asdict, is_dataclass
+from typing import Any, Optional
+
+from ntviz.utils import count_tokens
+
+logger = logging.getLogger("ntviz")
+
+# tokens the summary may take in a prompt
+SUMMARY_TOKEN_BUDGET = 3000
+MAX_SAMPLE_CHARS = 40
+MAX_DESCRIPTION_CHARS = 300
+# detail levels tried in order until the summary fits the budget, each dropping the least informative
+# properties left: tail quantiles and std, then descriptions and extra samples, then samples and
+# semantic types, then statistics, and finally the details of the least informative fields
+SUMMARY_LEVELS = [
+    {"stats": ["min", "max", "p5", "p50", "p95", "std"], "samples": 3, "semantic": True, "description": True},
+    {"stats": ["min", "max", "p50"], "samples": 3, "semantic": True, "description": True},
+    {"stats": ["min", "max", "p50"], "samples": 1, "semantic": True, "description": False},
+    {"stats": ["min", "max"], "samples": 0, "semantic": False, "description": False},
+    {"stats": [], "samples": 0, "semantic": False, "description": False},
+]
+
+
+class SummaryEncoder(object):
+    """Serialize a dataset summary compactly for prompts, within a token budget"""
+
+    def __init__(self, token_budget: int = SUMMARY_TOKEN_BUDGET) -> None:
+        """
+        Args:
+            token_budget (int, optional): Tokens the encoded summary may take. Defaults to SUMMARY_TOKEN_BUDGET.
+        """
+        self.token_budget = token_budget
+
+    @staticmethod
+    def format_value(value: Any, max_chars: int = MAX_SAMPLE_CHARS) -> str:
+        """Round numbers to 4 significant digits and truncate long strings"""
+        if isinstance(value, bool) or value is None:
+            return str(value)
+        if isinstance(value, float):
+            rounded = float(f"{value:.4g}")
+            return str(int(rounded)) if rounded.is_integer() and abs(rounded) < 1e15 else str(rounded)
+        if isinstance(value, int):
+            return str(value)
+        text = str(value).replace("\n", " ")
+        return text if len(text) <= max_chars else text[:max_chars - 3] + "..."
+
+    def encode_field(self, column: str, properties: dict, level: dict) -> str:
+        """One line of a field, e.g. - price: number, 370 unique, min 10280, max 192465 | samples: 36945, 26060"""
+        details = [str(properties["dtype"])] if properties.get("dtype") else []
+        if properties.get("num_unique_values") is not None:
+            details.append(f"{properties['num_unique_values']} unique")
+        details.extend(f"{name} {self.format_value(properties[name])}"
+                       for name in level["stats"] if properties.get(name) is not None)
+        line = f"- {column}: {', '.join(details)}" if details else f"- {column}"
+        samples = properties.get("samples") or []
+        if level["samples"] and samples:
+            line += " | samples: " + ", ".join(self.format_value(sample) for sample in samples[:level["samples"]])
+        if level["semantic"] and properties.get("semantic_type"):
+            line += f" | {self.format_value(properties['semantic_type'])}"
+        if level["description"] and properties.get("description"):
+            line += f" | {self.format_value(properties['description'], MAX_DESCRIPTION_CHARS)}"
+        return line
+
+    @staticmethod
+    def informativeness(field: dict) -> int:
+        """Rank fields for keeping their details: described fields first, constant fields last"""
+        properties = field.get("properties") or {}
+        if (properties.get("num_unique_values") or 0) <= 1:
+            return 0
+        return 1 + bool(properties.get("semantic_type") or properties.get("description"))
+
+    def encode_level(self, summary: dict, level: dict, detailed: Optional[set] = None) -> str:
+        """Encode a summary dictionary at a detail level, only listing the names of fields not in detailed"""
+        lines = [f"Dataset: {summary.get('name') or summary.get('file_name') or ''}".rstrip()]
+        if summary.get("n_rows") is not None:
+            lines[0] += f" ({summary['n_rows']} rows)"
+        description = str(summary.get("dataset_description") or "").strip()
+        if description:
+            max_chars = MAX_DESCRIPTION_CHARS if level["description"] else MAX_DESCRIPTION_CHARS // 3
+            lines.append(f"Description: {self.format_value(description, max_chars)}")
+        fields = summary.get("fields") or [{"column": name, "properties": {}} for name in summary.get("field_names") or []]
+        lines.append("Fields (field_names with dtype, unique values, statistics | samples | semantic type | description):")
+        lines.extend(self.encode_field(field["column"], field.get("properties") or {}, level)
+                     for index, field in enumerate(fields) if detailed is None or index in detailed)
+        if detailed is not None and len(detailed) < len(fields):
+            lines.append("Other fields: " + ", ".join(
+                str(field["column"]) for index, field in enumerate(fields) if index not in detailed))
+        return "\n".join(lines)
+
+    def encode(self, summary: Any, model: Optional[str] = None) -> str:
+        """
+        Encode a summary at the most detailed level that fits the token budget. If no level fits, the
+        most informative fields keep their dtype and unique count and the others are listed by name only.
+        Only the fields in the detailed_fields of the summary are profiled, if it has any.
+
+        Args:
+            summary (Any): A Summary object, summary dictionary or already encoded summary.
+            model (str, optional): Model whose tokenizer measures the budget. Defaults to cl100k_base.
+
+        Returns:
+            str: The encoded summary, over the budget (with a warning) only if the field names alone are.
+        """
+        if isinstance(summary, str):
+            return summary
+        summary = asdict(summary) if is_dataclass(summary) else dict(summary)
+        fields = summary.get("fields") or []
+        pinned = None
+        if summary.get("detailed_fields") is not None:
+            pinned = {index for index, field in enumerate(fields) if field["column"] in summary["detailed_fields"]}
+        for level in SUMMARY_LEVELS:
+            text = self.encode_level(summary, level, pinned)
+            if count_tokens(text, model) <= self.token_budget:
+                return text
+
+        level = SUMMARY_LEVELS[-1]
+        text = self.encode_level(summary, level, detailed=set())
+        remaining = self.token_budget - count_tokens(text, model)
+        if remaining < 0:
+            logger.warning(f"Summary is over the budget of {self.token_budget} tokens even with field names only")
+            return text
+        detailed = set()
+        candidates = range(len(fields)) if pinned is None else sorted(pinned)
+        ranked = sorted(candidates, key=lambda index: -self.informativeness(fields[index]))
+        for index in ranked:
+            line = self.encode_field(fields[index]["column"], fields[index].get("properties") or {}, level)
+            # a detailed line replaces the name in the list of other fields
+            cost = count_tokens(line, model) + 1 - count_tokens(f", {fields[index]['column']}", model)
+            if cost > remaining:
+                break
+            detailed.add(index)
+            remaining -= cost
+        return self.encode_level(summary, level, detailed)
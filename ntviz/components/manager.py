@@ -6,19 +6,33 @@
 # execute the specification given some data
 
 import os
+import json
+import hashlib
+from dataclasses import asdict
 from typing import List, Union
 import logging
 
+import numpy as np
 import pandas as pd
 from llmx import llm, TextGenerator
 from ntviz.datamodel import Goal, Summary, TextGenerationConfig, Persona
-from ntviz.utils import read_dataframe
+from ntviz.utils import MAX_SAMPLE_ROWS, clean_column_names, read_dataframe, materialize_dataframe
+from ntviz.datacache import (dataframe_fingerprint, file_content_hash, load_cached_json, save_cached_json,
+                             load_cached_object, save_cached_object)
 from .ntzsummary import Summarizer
 from .ntzgoal import GoalExplorer
 from ..components.persona import PersonaExplorer
 from ..components.executor import ChartExecutor
 from ..components.viz import VizGenerator, VizEditor, VizExplainer, VizEvaluator, VizRecommender
 from ..components.analysis import Analyzer
+from ..components.tables import MultiTableDataset
+from ..components.cleaner import DataCleaner
+from ..components.query import QueryEngine
+from ..components.aggregates import AggregateCache
+from ..components.rollups import TimeRollups
+from ..components.spatial import SpatialIndex
+from ..components.watcher import DatasetWatcher
+from ..components.partitions import PartitionedDataset, detect_partition_column
 import ntviz.web_old as ntviz
 
 
@@ -37,6 +51,7 @@ class Manager(object):
         self.text_gen = text_gen or llm()
 
         self.summarizer = Summarizer()
+        self.cleaner = DataCleaner()
         self.goal = GoalExplorer()
         self.vizgen = VizGenerator()
         self.vizeditor = VizEditor()
@@ -46,6 +61,18 @@ class Manager(object):
         self.recommender = VizRecommender()
         self.analyzer = Analyzer()
         self.data = None
+        # rows the chart data of a file is capped at, None if it holds the full dataset
+        self.sample_cap = None
+        self.tables = None
+        self.backend = "pandas"
+        self.query_engine = None
+        self.aggregates = None
+        self.rollups = None
+        self.spatial = None
+        self.partitions = None
+        # what the last summary was computed from, to store updated summaries under
+        self.summary_source = None
+        self.summary_params = None
         self.infographer = None
         self.persona = PersonaExplorer()
 
@@ -69,23 +96,85 @@ class Manager(object):
                 config.provider)
             self.text_gen = llm(provider=config.provider)
 
+    def clean(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Fill missing numeric values with the column mean and drop duplicate rows.
+        Each dataset is only cleaned once, later calls with the same data return the cached result.
+
+        Args:
+            data (pd.DataFrame): Input data.
+
+        Returns:
+            pd.DataFrame: The cleaned data. self.cleaner.clean_with_report also returns what was cleaned.
+        """
+        return self.cleaner.clean(data)
+
+    def summary_cache_key(self, source: Union[pd.DataFrame, str], textgen_config: TextGenerationConfig,
+                          **params) -> str:
+        """
+        Compute the key of a summary in the summary cache from the content fingerprint of the data,
+        the summary parameters and the model configuration. Files are keyed by the sha256 of their
+        content, so moved or re-saved copies of the same data reuse the summary.
+
+        Args:
+            source (Union[pd.DataFrame, str]): The summarized DataFrame or file path.
+            textgen_config (TextGenerationConfig): Text generation configuration.
+            **params: Summary parameters such as n_samples and summary_method.
+
+        Returns:
+            str: The cache key.
+        """
+        fingerprint = file_content_hash(source) if isinstance(source, str) else dataframe_fingerprint(source)
+        config = {name: value for name, value in asdict(textgen_config).items() if name != "use_cache"}
+        key = {
+            "data": fingerprint,
+            "params": params,
+            "textgen_config": config,
+            "model": config.get("model") or getattr(self.text_gen, "model_name", None),
+        }
+        return hashlib.md5(json.dumps(key, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
     def summarize(
         self,
-        data: Union[pd.DataFrame, str],
+        data: Union[pd.DataFrame, str, MultiTableDataset],
         file_name="",
         n_samples: int = 3,
         summary_method: str = "default",
         textgen_config: TextGenerationConfig = TextGenerationConfig(n=1, temperature=0),
+        compact: bool = False,
+        sort_by_time: bool = False,
+        backend: str = "pandas",
+        partition_column: str = None,
+        sketch: bool = False,
+        use_cache: bool = True,
     ) -> Summary:
         """
         Summarize data given a DataFrame or file path.
 
         Args:
-            data (Union[pd.DataFrame, str]): Input data, either a DataFrame or file path.
+            data (Union[pd.DataFrame, str, MultiTableDataset]): Input data, either a DataFrame, file path or
+                a set of related tables. Related tables are summarized through their pre-joined view.
             file_name (str, optional): Name of the file if data is loaded from a file path. Defaults to "".
             n_samples (int, optional): Number of summary samples to generate. Defaults to 3.
             summary_method (str, optional): Summary method to use. Defaults to "default".
             textgen_config (TextGenerationConfig, optional): Text generation configuration. Defaults to TextGenerationConfig(n=1, temperature=0).
+            compact (bool, optional): Downcast float columns and convert low-cardinality strings to category
+                when loading data. Defaults to False.
+            sort_by_time (bool, optional): Sort the data along its primary date column. Defaults to False.
+            backend (str, optional): Execution backend for the generated code. "pandas" runs it on the data
+                only, "duckdb" also loads the full dataset into DuckDB and gives the code a sql(query) helper,
+                "polars" hands the code the data as a Polars DataFrame, "partitioned" stores the full dataset
+                as parquet partitioned on a date (by year) or category column and gives the code a
+                scan(filters, columns) helper that only reads the partitions the filters match. Defaults to "pandas".
+            partition_column (str, optional): Column to partition on with the "partitioned" backend.
+                Defaults to the primary date column, or else a low-cardinality category column.
+            sketch (bool, optional): Estimate unique counts with HyperLogLog (about 1.6% relative error) and
+                the p5/p50/p95 quantiles with a KLL sketch (rank within about 1.65%), in linear time and
+                constant memory per column. Defaults to False: unique counts are exact, and so are the quantiles
+                of a DataFrame or of a file that fits in the sample. The quantiles of larger files always come from
+                the KLL sketch of the full file, as exact quantiles would need all its values in memory.
+            use_cache (bool, optional): Return the stored summary of unchanged data summarized with the same
+                parameters and model configuration, instead of summarizing it again. Defaults to True.
 
         Returns:
             Summary: Summary object containing the generated summary.
@@ -114,6 +203,9 @@ class Manager(object):
                 'std': 0,
                 'min': 0,
                 'max': 1,
+                'p5': 0.0,
+                'p50': 0.0,
+                'p95': 1.0,
                 'samples': [1, 0],
                 'num_unique_values': 2,
                 'semantic_type': '',
@@ -123,14 +215,134 @@ class Manager(object):
         """
         self.check_textgen(config=textgen_config)
 
+        self.tables = None
+        source = data
         if isinstance(data, str):
             file_name = data.split("/")[-1]
-            data = read_dataframe(data)
+            data = read_dataframe(data, compact=compact)
+        elif isinstance(data, MultiTableDataset):
+            file_name = file_name or data.name
+            self.tables = data
+            data = source = data.joined()
+
+        self.sample_cap = MAX_SAMPLE_ROWS if isinstance(source, str) else None
+        self.backend = backend
+        # the full dataset is queried from duckdb, data stays a sample for plotting
+        self.query_engine = QueryEngine(source) if backend == "duckdb" else None
+
+        # fingerprinted after reading, which may rewrite the file with cleaned column names
+        self.summary_source = source if isinstance(source, str) else None
+        # update() only re-caches the file once it has grown past this size
+        self.summary_source_size = os.path.getsize(source) if isinstance(source, str) else None
+        self.summary_params = (textgen_config, dict(
+            file_name=file_name, n_samples=n_samples, summary_method=summary_method, compact=compact, sketch=sketch))
+        cache_key = self.summary_cache_key(source, self.summary_params[0], **self.summary_params[1])
+        summary = load_cached_json(cache_key, namespace="summaries") if use_cache else None
+        if summary is None:
+            # statistics are computed over the full file even when data is a sample of it
+            summary = self.summarizer.summarize(
+                data=data, text_gen=self.text_gen, file_name=file_name, n_samples=n_samples,
+                summary_method=summary_method, textgen_config=textgen_config,
+                file_location=source if isinstance(source, str) else None, sketch=sketch)
+            save_cached_json(cache_key, summary, namespace="summaries")
+            # the mergeable statistics live next to the summary, for update()
+            save_cached_object(cache_key, self.summarizer.statistics, namespace="statistics")
+        else:
+            logger.info(f"Using the cached summary of {file_name or 'the data'}")
+            self.summarizer.statistics = load_cached_object(cache_key, namespace="statistics")
+            if summary.get("unenriched") and summary_method == "llm":
+                # only the descriptions that failed last time are requested again
+                try:
+                    summary = self.summarizer.enrich(summary, text_gen=self.text_gen, textgen_config=textgen_config)
+                    save_cached_json(cache_key, summary, namespace="summaries")
+                except ValueError as error:
+                    logger.warning(f"Could not complete the enrichment of the cached summary: {error}")
+
+        # keep the data with date columns already parsed for the generated code
+        self.data = materialize_dataframe(data, summary, sort_by_time=sort_by_time)
+        self.aggregates = AggregateCache(self.data)
+        self.rollups = TimeRollups(self.data)
+        # None unless the data has latitude/longitude columns
+        self.spatial = SpatialIndex.from_summary(self.data, summary)
+
+        self.partitions = None
+        if backend == "partitioned":
+            if isinstance(source, str):
+                self.partitions = PartitionedDataset.from_file(source, summary, partition_column=partition_column)
+            else:
+                full_data = materialize_dataframe(source, summary)
+                partition_column = partition_column or detect_partition_column(full_data, summary)
+                if partition_column is not None:
+                    self.partitions = PartitionedDataset(full_data, partition_column)
+            if self.partitions is None:
+                logger.warning("No column to partition the data on, falling back to the pandas backend")
+                self.backend = "pandas"
+        return summary
+
+    def update(self, summary: Summary, new_rows: pd.DataFrame) -> Summary:
+        """
+        Update the last summary with rows appended to its dataset. Only the new rows are profiled,
+        the statistics of the rows seen so far are reused and the names, descriptions and semantic types
+        are kept, so no LLM call is made. The new rows are also folded into the data charts are drawn from:
+        a sample of a file stays at its size and holds old and new rows in proportion to their counts.
+        For a file, the updated summary is only cached once the file has grown, i.e. when update is called
+        after the rows were written to it.
+
+        Args:
+            summary (Summary): The summary returned by summarize.
+            new_rows (pd.DataFrame): The appended rows.
+
+        Returns:
+            Summary: The updated summary.
+        """
+        if not isinstance(summary, dict):
+            summary = asdict(summary)
+        summary = self.summarizer.update(summary, new_rows)
+
+        new_rows = materialize_dataframe(clean_column_names(new_rows), summary)
+        self.data = self.fold_sample(new_rows, summary["n_rows"])
+        self.aggregates = AggregateCache(self.data)
+        self.rollups = TimeRollups(self.data)
+        self.spatial = SpatialIndex.from_summary(self.data, summary)
+        if self.query_engine is not None:
+            self.query_engine.append(new_rows)
+
+        summary["sample_size"] = len(self.data)
+
+        if self.summary_source is not None and os.path.exists(self.summary_source):
+            size = os.path.getsize(self.summary_source)
+            if size > self.summary_source_size:
+                # the appended file is summarized from the cache next time
+                cache_key = self.summary_cache_key(self.summary_source, self.summary_params[0], **self.summary_params[1])
+                save_cached_json(cache_key, summary, namespace="summaries")
+                save_cached_object(cache_key, self.summarizer.statistics, namespace="statistics")
+                self.summary_source_size = size
+            else:
+                # caching now would store the updated summary under the fingerprint of the file without the rows
+                logger.info(f"{self.summary_source} has not grown, the updated summary is not cached")
+        return summary
+
+    def fold_sample(self, new_rows: pd.DataFrame, n_rows: int) -> pd.DataFrame:
+        """
+        Add appended rows to the chart data. A capped sample keeps its size, and afterwards holds every
+        row of the dataset with the same probability, as if it was sampled from all n_rows rows.
+
+        Args:
+            new_rows (pd.DataFrame): The appended rows.
+            n_rows (int): Rows of the dataset, including the appended rows.
 
-        self.data = data
-        return self.summarizer.summarize(
-            data=self.data, text_gen=self.text_gen, file_name=file_name, n_samples=n_samples,
-            summary_method=summary_method, textgen_config=textgen_config)
+        Returns:
+            pd.DataFrame: The chart data with the appended rows folded in.
+        """
+        if self.sample_cap is None or len(self.data) + len(new_rows) <= self.sample_cap:
+            return pd.concat([self.data, new_rows], ignore_index=True)
+        rng = np.random.default_rng()
+        size = min(self.sample_cap, n_rows)
+        # the number of new rows in a uniform sample of size rows out of all rows
+        n_new = rng.hypergeometric(len(new_rows), max(n_rows - len(new_rows), 0), size)
+        kept = np.sort(rng.choice(len(self.data), min(size - n_new, len(self.data)), replace=False))
+        added = np.sort(rng.choice(len(new_rows), n_new, replace=False))
+        return pd.concat([self.data.iloc[kept], new_rows.iloc[added]], ignore_index=True)
 
     def goals(
         self,
@@ -201,7 +413,7 @@ class Manager(object):
         self.check_textgen(config=textgen_config)
         code_specs = self.vizgen.generate(
             summary=summary, goal=goal, textgen_config=textgen_config, text_gen=self.text_gen,
-            library=library)
+            library=library, backend=self.backend, data=self.data)
         charts = self.execute(
             code_specs=code_specs,
             data=self.data,
@@ -227,7 +439,24 @@ class Manager(object):
                 os.path.join(root_file_path, "files/data", summary.file_name)
             )
 
-        # col_properties = summary.properties
+        # hand the generated code typed data, a no-op if the dates are already parsed
+        data = materialize_dataframe(data, summary)
+
+        helpers = {}
+        if self.aggregates is not None and data is self.aggregates.data:
+            # aggregates are memoized across charts, edits and recommendations of this dataset
+            helpers["aggregate"] = self.aggregates.aggregate
+        if self.rollups is not None and data is self.rollups.data:
+            helpers["rollup"] = self.rollups.rollup
+        if self.spatial is not None and data is self.spatial.data:
+            helpers["spatial_bins"] = self.spatial.bins
+        if self.tables is not None:
+            # lets generated code reuse the pre-built join indexes instead of merging tables
+            helpers["tables"] = self.tables
+        if self.query_engine is not None:
+            helpers["sql"] = self.query_engine.sql
+        if self.partitions is not None:
+            helpers["scan"] = self.partitions.scan
 
         return self.executor.execute(
             code_specs=code_specs,
@@ -235,8 +464,24 @@ class Manager(object):
             summary=summary,
             library=library,
             return_error=return_error,
+            helpers=helpers,
+            backend=self.backend,
         )
 
+    def watch(self, folder: str, max_rows: int = 4500) -> DatasetWatcher:
+        """
+        Watch a dataset folder for refreshed files. Store charts with add_charts on the returned watcher,
+        then call its poll() or watch() to re-execute the charts of changed files without any LLM call.
+
+        Args:
+            folder (str): The folder holding the datasets.
+            max_rows (int, optional): Rows sampled from a changed file to draw charts with. Defaults to 4500.
+
+        Returns:
+            DatasetWatcher: The watcher of the folder.
+        """
+        return DatasetWatcher(self, folder, max_rows=max_rows)
+
     def edit(
         self,
         code,
@@ -268,6 +513,7 @@ class Manager(object):
             textgen_config=textgen_config,
             text_gen=self.text_gen,
             library=library,
+            backend=self.backend,
         )
 
         charts = self.execute(
@@ -360,6 +606,7 @@ class Manager(object):
             textgen_config=textgen_config,
             text_gen=self.text_gen,
             library=library,
+            backend=self.backend,
         )
         charts = self.execute(
             code_specs=code_specs,
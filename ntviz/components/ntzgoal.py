@@ -3,6 +3,7 @@ import logging
 from ntviz.utils import clean_code_snippet
 from llmx import TextGenerator
 from ntviz.datamodel import Goal, TextGenerationConfig, Persona
+from ntviz.components.encoder import SummaryEncoder, SUMMARY_TOKEN_BUDGET
 
 
 # ------------------------------------------ Original ----------------------------------------------
@@ -144,15 +145,15 @@ logger = logging.getLogger("lida")
 class GoalExplorer():
     """Generate goals given a summary of data"""
 
-    def __init__(self) -> None:
-        pass
+    def __init__(self, token_budget: int = SUMMARY_TOKEN_BUDGET) -> None:
+        self.encoder = SummaryEncoder(token_budget)
 
     def generate(self, summary: dict, textgen_config: TextGenerationConfig,
                  text_gen: TextGenerator, n=5, persona: Persona = None) -> list[Goal]:
         """Generate goals given a summary of data"""
 
         user_prompt = f"""The number of GOALS to generate is {n}. The goals should be based on the data summary below, \n\n .
-        {summary} \n\n"""
+        {self.encoder.encode(summary, textgen_config.model)} \n\n"""
 
         if not persona:
             persona = Persona(
@@ -7,6 +7,40 @@ from ntviz.datamodel import Goal
 # len(ax.get_xticks()) > 20 assuming plot is made with ax, set a max of 20
 # ticks on x axis, ticker.MaxNLocator(20)
 
+# helpers the executor binds to data, only offered with the pandas backend: with duckdb and partitioned,
+# data is a sample and aggregates must come from sql/scan, and with polars data is not a pandas DataFrame
+pandas_helper_instructions = """
+        - For a single aggregation of a numeric field by one or more fields, use the available helper aggregate(by, value, agg), e.g. aggregate("Type", "Retail_Price", "mean").
+          agg is one of count, sum, mean, median, min, max, std, nunique. It returns a DataFrame with the group columns and the value column. DO NOT define or import it.
+        - For trends over time, use the available helper rollup(date_column, value, freq, agg) instead of resampling, e.g. rollup("date", "temp_max", "month", "mean").
+          freq is one of day, week, month, quarter, year. It returns a DataFrame with the period start in date_column and the value column. DO NOT define or import it.
+        - For maps of latitude/longitude fields, draw pre-binned grid cells from the available helper spatial_bins(value, agg, bounds=None) instead of every raw point, e.g. spatial_bins("confirmed", "sum").
+          It picks the cell size for the map extent and returns a DataFrame with the cell centers in the latitude and longitude columns, the row count in count and the value column. DO NOT define or import it.
+"""
+
+backend_instructions = {
+    "pandas": "",
+    "duckdb": """
+        The variable data holds a SAMPLE of the dataset, use it only for drawing raw points.
+        For aggregations, group-bys and filters, ALWAYS compute them over the FULL dataset with the available helper sql(query),
+        which runs a DuckDB SQL query against the table `dataset` and returns a pandas DataFrame, e.g. sql("SELECT Type, AVG(Retail_Price) AS price FROM dataset GROUP BY Type").
+        Quote column names with double quotes in SQL. DO NOT import duckdb or create connections.
+        """,
+    "partitioned": """
+        The variable data holds a SAMPLE of the dataset, use it only for drawing raw points.
+        When the chart needs all rows for a subset of the data, e.g. a date range or some categories, read them with the available helper
+        scan(filters, columns), which reads only the matching rows of the FULL dataset and returns a pandas DataFrame with date fields parsed,
+        e.g. scan(filters=[("Date", ">=", "2017-01-01"), ("region", "in", ["West", "Albany"])], columns=["Date", "region", "AveragePrice"]).
+        Filters are (column, op, value) tuples with op one of ==, !=, <, <=, >, >=, in, not in. ALWAYS pass the filters to scan instead of filtering afterwards.
+        """,
+    "polars": """
+        The variable data is a POLARS DataFrame (import polars as pl), NOT a pandas DataFrame.
+        Do ALL filtering, grouping, aggregation and reshaping with Polars expressions, e.g. data.group_by("Type").agg(pl.col("Retail_Price").mean()),
+        and call .to_pandas() only on the final, small result right before passing it to the plotting library.
+        """,
+}
+
+
 class ChartScaffold(object):
     """Return code scaffold for charts in multiple visualization libraries"""
 
@@ -16,7 +50,7 @@ class ChartScaffold(object):
 
         pass
 
-    def get_template(self, goal: Goal, library: str):
+    def get_template(self, goal: Goal, library: str, backend: str = "pandas"):
 
         # general_instructions = f"""
         # If the solution requires a single value (e.g. max, min, median, first, last etc), 
@@ -34,12 +68,15 @@ class ChartScaffold(object):
         # """
         
         
+        helper_instructions = pandas_helper_instructions if backend == "pandas" else ""
         general_instructions = """
         You are a helpful and professional assistant with expertise in generating optimized code templates for data visualizations.
         1. Preprocessing data:
         - Identify numerical vs categorical fields.
         - Analyze the dataset summary to determine field types (`semantic_type`).
         - Apply necessary preprocessing  
+        - Fields with dtype `date` are ALREADY parsed to datetime64 in data. DO NOT call pd.to_datetime on them again.
+""" + helper_instructions + """
        
 
         2. Handle single-value insights properly:
@@ -149,4 +186,12 @@ chart = plot(data) # variable data already contains the data to be plotted and s
                 "Unsupported library. Choose from 'matplotlib', 'seaborn', 'plotly', 'bokeh', 'ggplot', 'altair'."
             )
 
+        if backend not in backend_instructions:
+            raise ValueError(
+                f"Unsupported backend. Choose from {', '.join(backend_instructions)}.")
+        instructions["content"] += backend_instructions[backend]
+        if backend == "polars":
+            template = "\nimport polars as pl" + template.replace(
+                "def plot(data: pd.DataFrame):", "def plot(data: pl.DataFrame):")
+
         return template, instructions
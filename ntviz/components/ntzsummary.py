@@ -1,11 +1,18 @@
+import copy
 import json
 import logging
-from typing import Union
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union
+import numpy as np
 import pandas as pd
-from ntviz.utils import clean_code_snippet, read_dataframe
+from ntviz.utils import clean_code_snippet, clean_column_names, read_dataframe, detect_dates
 from ntviz.datamodel import TextGenerationConfig
 from llmx import TextGenerator
 import warnings
+from .stats import DatasetStatistics
+from .sketches import HyperLogLog, KLLSketch
+from .encoder import SummaryEncoder
 
 # system_prompt = """
 # You are an experienced data analyst that can annotate datasets. Your instructions are as follows:
@@ -35,10 +42,25 @@ You MUST return an updated JSON dictionary without any preamble or explanation.
 
 logger = logging.getLogger("lida")
 
+# quantiles added to the properties of numeric fields
+SUMMARY_QUANTILES = {"p5": 0.05, "p50": 0.5, "p95": 0.95}
+# fields annotated per enrichment request, concurrent requests and retries of a failed request
+ENRICH_CHUNK_SIZE = 20
+ENRICH_CONCURRENCY = 8
+ENRICH_RETRIES = 2
+
 
 class Summarizer():
-    def __init__(self) -> None:
+    def __init__(self, n_workers: int = None) -> None:
+        """
+        Args:
+            n_workers (int, optional): Threads used to profile columns. Defaults to the number of CPUs (at most 32).
+        """
         self.summary = None
+        self.encoder = SummaryEncoder()
+        self.n_workers = n_workers or min(32, os.cpu_count() or 1)
+        # mergeable statistics of the last summarized dataset, folded into by update
+        self.statistics = None
 
     def check_type(self, dtype: str, value):
         """Cast value to right type to ensure it is JSON serializable"""
@@ -49,103 +71,354 @@ class Summarizer():
         else:
             return value
 
-    def get_column_properties(self, df: pd.DataFrame, n_samples: int = 3) -> list[dict]:
-        """Get properties of each column in a pandas DataFrame"""
-        properties_list = []
-        for column in df.columns:
-            dtype = df[column].dtype
-            properties = {}
-            if dtype in [int, float, complex]:
-                properties["dtype"] = "number"
-                properties["std"] = self.check_type(dtype, df[column].std())
-                properties["min"] = self.check_type(dtype, df[column].min())
-                properties["max"] = self.check_type(dtype, df[column].max())
-
-            elif dtype == bool:
-                properties["dtype"] = "boolean"
-            elif dtype == object:
-                # Check if the string column can be cast to a valid datetime
-                try:
-                    with warnings.catch_warnings():
-                        warnings.simplefilter("ignore")
-                        pd.to_datetime(df[column], errors='raise')
-                        properties["dtype"] = "date"
-                except ValueError:
-                    # Check if the string column has a limited number of values
-                    if df[column].nunique() / len(df[column]) < 0.5:
-                        properties["dtype"] = "category"
-                    else:
-                        properties["dtype"] = "string"
-            elif pd.api.types.is_categorical_dtype(df[column]):
-                properties["dtype"] = "category"
-            elif pd.api.types.is_datetime64_any_dtype(df[column]):
+    def get_samples(self, series: pd.Series, sampled_rows: pd.Series, n_samples: int, nunique: int) -> list:
+        """Draw distinct non-null sample values without building the unique array of high-cardinality columns"""
+        n_samples = min(n_samples, nunique)
+        if n_samples == 0:
+            return []
+        # a few random rows almost always hold enough distinct values
+        candidates = sampled_rows.dropna().drop_duplicates()
+        if len(candidates) >= n_samples:
+            return candidates.head(n_samples).tolist()
+        # skewed low-cardinality columns, where the unique array is small
+        return pd.Series(series.dropna().unique()).sample(n_samples, random_state=42).tolist()
+
+    def profile_numeric(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Compute std, min, max, quantiles and the number of unique values of all numeric columns in one vectorized pass"""
+        values = np.sort(df.to_numpy(dtype=float, na_value=np.nan), axis=0)
+        if len(values) == 0:
+            values = np.full((1, values.shape[1]), np.nan)
+        # NaN sorts last, so each column is its sorted values followed by its missing values
+        valid = ~np.isnan(values)
+        counts = valid.sum(axis=0)
+        columns = np.arange(values.shape[1])
+        last = np.maximum(counts - 1, 0)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            std = np.nanstd(values, axis=0, ddof=1)
+        changes = (values[1:] != values[:-1]) & valid[1:]
+        profile = {
+            "std": std,
+            "min": np.where(counts > 0, values[0], np.nan),
+            "max": np.where(counts > 0, values[last, columns], np.nan),
+            "nunique": changes.sum(axis=0) + valid[0],
+        }
+        # linear interpolation between the closest ranks, like pandas quantile
+        for name, q in SUMMARY_QUANTILES.items():
+            position = q * last
+            lower = np.floor(position).astype(int)
+            upper = np.minimum(lower + 1, last)
+            quantile = values[lower, columns] + (values[upper, columns] - values[lower, columns]) * (position - lower)
+            profile[name] = np.where(counts > 0, quantile, np.nan)
+        return pd.DataFrame(profile, index=df.columns).T
+
+    def profile_sketch(self, df: pd.DataFrame, numeric_columns: list) -> pd.DataFrame:
+        """
+        Profile all columns in linear time and constant memory per column. Unique values are
+        estimated with HyperLogLog (about 1.6% relative error) and quantiles with a KLL sketch
+        (rank within about 1.65% with 99% confidence), std, min and max are exact.
+        """
+        profile = {}
+        values = df[numeric_columns].to_numpy(dtype=float, na_value=np.nan)
+        std = minimum = maximum = np.full(values.shape[1], np.nan)
+        if values.size:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                std, minimum, maximum = (np.nanstd(values, axis=0, ddof=1), np.nanmin(values, axis=0),
+                                         np.nanmax(values, axis=0))
+        for index, column in enumerate(df.columns):
+            distinct = HyperLogLog()
+            distinct.update(df[column])
+            profile[column] = {"nunique": distinct.estimate()}
+            if column in numeric_columns:
+                position = numeric_columns.index(column)
+                quantiles = KLLSketch()
+                quantiles.update(values[:, position])
+                profile[column].update(zip(SUMMARY_QUANTILES, quantiles.quantiles(list(SUMMARY_QUANTILES.values()))))
+                profile[column].update(std=std[position], min=minimum[position], max=maximum[position])
+        return pd.DataFrame(profile, columns=df.columns)
+
+    def batches(self, columns: list, min_batch_size: int = 8) -> list[list]:
+        """Split columns into contiguous batches, at most one per worker"""
+        n_batches = max(1, min(self.n_workers, len(columns) // min_batch_size))
+        size = -(-len(columns) // n_batches) if columns else 1
+        return [columns[start:start + size] for start in range(0, len(columns), size)]
+
+    def map_batches(self, pool: Optional[ThreadPoolExecutor], function, batches: list[list]) -> list:
+        """Apply function to each batch, in the pool if there is one, keeping the order of the batches"""
+        if pool is None or len(batches) < 2:
+            return [function(batch) for batch in batches]
+        return list(pool.map(function, batches))
+
+    def profile_columns(self, df: pd.DataFrame, numeric_columns: list, sketch: bool,
+                        pool: Optional[ThreadPoolExecutor] = None) -> tuple:
+        """Profile numeric and other columns in separate batches, returning the numeric statistics and unique counts"""
+        other_columns = [column for column in df.columns if column not in numeric_columns]
+        if sketch:
+            numeric_profiles = self.map_batches(
+                pool, lambda batch: self.profile_sketch(df[batch], batch), self.batches(numeric_columns))
+            other_profiles = self.map_batches(
+                pool, lambda batch: self.profile_sketch(df[batch], []), self.batches(other_columns))
+            other_nunique = [profile.loc["nunique"] for profile in other_profiles]
+        else:
+            numeric_profiles = self.map_batches(
+                pool, lambda batch: self.profile_numeric(df[batch]), self.batches(numeric_columns))
+            other_nunique = self.map_batches(pool, lambda batch: df[batch].nunique(), self.batches(other_columns))
+
+        numeric_stats = pd.concat(numeric_profiles, axis=1) if numeric_profiles else pd.DataFrame()
+        nunique_values = {}
+        for nunique in other_nunique:
+            nunique_values.update(nunique.to_dict())
+        if numeric_profiles:
+            nunique_values.update(numeric_stats.loc["nunique"].to_dict())
+        return numeric_stats, nunique_values
+
+    def get_column_properties(self, df: pd.DataFrame, n_samples: int = 3, sketch: bool = False) -> list[dict]:
+        """Get properties of each column in a pandas DataFrame.
+        With sketch, unique counts and quantiles are estimated with probabilistic sketches.
+        Wide DataFrames are profiled in batches of columns across a thread pool."""
+        numeric_columns = [column for column in df.columns
+                           if pd.api.types.is_numeric_dtype(df[column]) and not pd.api.types.is_bool_dtype(df[column])]
+        # candidate rows for the samples of every column, taken in one pass
+        sampled_rows = df.iloc[np.random.default_rng(42).integers(0, max(len(df), 1), 20 * n_samples if len(df) else 0)]
+
+        # numpy sorts and pandas hashing release the GIL, so threads profile columns in parallel
+        pool = ThreadPoolExecutor(max_workers=self.n_workers) if self.n_workers > 1 else None
+        try:
+            numeric_stats, nunique_values = self.profile_columns(df, numeric_columns, sketch, pool)
+            properties_batches = self.map_batches(
+                pool, lambda batch: [
+                    {"column": column, "properties": self.column_properties(
+                        df[column], column in numeric_columns, numeric_stats, int(nunique_values[column]),
+                        sampled_rows[column], n_samples)}
+                    for column in batch],
+                self.batches(list(df.columns)))
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return [field for batch in properties_batches for field in batch]
+
+    def column_properties(self, series: pd.Series, is_numeric: bool, numeric_stats: pd.DataFrame,
+                          nunique: int, sampled_rows: pd.Series, n_samples: int) -> dict:
+        """Get the properties of a single column from its precomputed statistics"""
+        column = series.name
+        dtype = series.dtype
+        properties = {}
+        if is_numeric:
+            properties["dtype"] = "number"
+            properties["std"] = self.check_type(dtype, numeric_stats.at["std", column])
+            properties["min"] = self.check_type(dtype, numeric_stats.at["min", column])
+            properties["max"] = self.check_type(dtype, numeric_stats.at["max", column])
+            for name in SUMMARY_QUANTILES:
+                properties[name] = float(numeric_stats.at[name, column])
+
+        elif dtype == bool:
+            properties["dtype"] = "boolean"
+        elif dtype == object:
+            # Check if the string column can be cast to a valid datetime, from a sample first
+            if detect_dates(series)[0]:
                 properties["dtype"] = "date"
+            # Check if the string column has a limited number of values
+            elif nunique / len(series) < 0.5:
+                properties["dtype"] = "category"
             else:
-                properties["dtype"] = str(dtype)
+                properties["dtype"] = "string"
+        elif pd.api.types.is_categorical_dtype(series):
+            properties["dtype"] = "category"
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            properties["dtype"] = "date"
+        else:
+            properties["dtype"] = str(dtype)
 
-            # add min max if dtype is date
-            if properties["dtype"] == "date":
-                try:
-                    properties["min"] = df[column].min()
-                    properties["max"] = df[column].max()
-                except TypeError:
-                    cast_date_col = pd.to_datetime(df[column], errors='coerce')
-                    properties["min"] = cast_date_col.min()
-                    properties["max"] = cast_date_col.max()
-            # Add additional properties to the output dictionary
-            nunique = df[column].nunique()
-            if "samples" not in properties:
-                non_null_values = df[column][df[column].notnull()].unique()
-                n_samples = min(n_samples, len(non_null_values))
-                samples = pd.Series(non_null_values).sample(
-                    n_samples, random_state=42).tolist()
-                properties["samples"] = samples
-            properties["num_unique_values"] = nunique
-            properties["semantic_type"] = ""
-            properties["description"] = ""
-            properties_list.append(
-                {"column": column, "properties": properties})
+        # add min max if dtype is date
+        if properties["dtype"] == "date":
+            try:
+                properties["min"] = series.min()
+                properties["max"] = series.max()
+            except TypeError:
+                cast_date_col = pd.to_datetime(series, errors='coerce')
+                properties["min"] = cast_date_col.min()
+                properties["max"] = cast_date_col.max()
+        # Add additional properties to the output dictionary
+        if "samples" not in properties:
+            properties["samples"] = self.get_samples(series, sampled_rows, n_samples, nunique)
+        properties["num_unique_values"] = nunique
+        properties["semantic_type"] = ""
+        properties["description"] = ""
+        return properties
 
+    def apply_full_statistics(self, properties_list: list[dict], statistics: DatasetStatistics,
+                              sample_size: Optional[int] = None) -> list[dict]:
+        """Replace sample-based statistics with statistics of the full dataset.
+        The exact quantiles of a sample that holds every row (statistics.n_rows <= sample_size) are kept,
+        otherwise they are estimated from the quantile sketch of the full dataset."""
+        sampled = sample_size is None or statistics.n_rows > sample_size
+        for field in properties_list:
+            column_statistics = statistics.columns.get(field["column"])
+            if column_statistics is None:
+                continue
+            properties = field["properties"]
+            properties["num_unique_values"] = column_statistics.num_unique_values
+            if properties["dtype"] == "number" and column_statistics.count:
+                # keep the JSON serializable type of the sample statistics
+                cast = type(properties["min"])
+                properties["std"] = column_statistics.std
+                properties["min"] = cast(column_statistics.min)
+                properties["max"] = cast(column_statistics.max)
+                if sampled:
+                    quantiles = column_statistics.quantiles(list(SUMMARY_QUANTILES.values()))
+                    properties.update(zip(SUMMARY_QUANTILES, quantiles))
+            elif properties["dtype"] == "date" and column_statistics.min is not None:
+                # dates of string columns stay strings, as in the sample statistics and cached summaries
+                as_string = isinstance(properties.get("min"), str)
+                properties["min"] = self.format_date(column_statistics.min) if as_string else column_statistics.min
+                properties["max"] = self.format_date(column_statistics.max) if as_string else column_statistics.max
         return properties_list
 
-    def enrich(self, base_summary: dict, text_gen: TextGenerator,
-               textgen_config: TextGenerationConfig) -> dict:
-        """Enrich the data summary with descriptions"""
-        logger.info(f"Enriching the data summary with descriptions")
+    @staticmethod
+    def format_date(value: pd.Timestamp) -> str:
+        """ISO format of a timestamp, without the time at midnight"""
+        return value.strftime("%Y-%m-%d") if value == value.normalize() else value.isoformat(sep=" ")
+
+    def request_json(self, messages: list, text_gen: TextGenerator, textgen_config: TextGenerationConfig):
+        """Send messages and parse the JSON in the response"""
+        response = text_gen.generate(messages=messages, config=textgen_config)
+        try:
+            return json.loads(clean_code_snippet(response.text[0]["content"]))
+        except json.decoder.JSONDecodeError:
+            raise ValueError(f"The model did not return a valid JSON object | {response.text[0]['content']}")
 
+    def describe_dataset(self, base_summary: dict, text_gen: TextGenerator,
+                         textgen_config: TextGenerationConfig) -> dict:
+        """Generate the name and description of a dataset from its compact summary"""
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "assistant", "content": f"""
-        Annotate the dictionary below. Only return a JSON object.
-        {base_summary}
+        Generate the name and dataset_description of the dataset summarized below. Only return a JSON object
+        of the form {{"name": "...", "dataset_description": "..."}}.
+        {self.encoder.encode(base_summary, textgen_config.model)}
         """},
         ]
+        result = self.request_json(messages, text_gen, textgen_config)
+        if not isinstance(result, dict):
+            raise ValueError(f"Expected a JSON object with the dataset description, got {result}")
+        return {key: result[key] for key in ("name", "dataset_description") if result.get(key)}
 
-        response = text_gen.generate(messages=messages, config=textgen_config)
-        enriched_summary = base_summary
-        try:
-            json_string = clean_code_snippet(response.text[0]["content"])
-            enriched_summary = json.loads(json_string)
-        except json.decoder.JSONDecodeError:
-            error_msg = f"The model did not return a valid JSON object while attempting to generate an enriched data summary. Consider using a default summary or  a larger model with higher max token length. | {response.text[0]['content']}"
+    def describe_fields(self, base_summary: dict, columns: list, text_gen: TextGenerator,
+                        textgen_config: TextGenerationConfig) -> dict:
+        """Generate the semantic type and description of some fields, keyed by column"""
+        fields = [field for field in base_summary["fields"] if field["column"] in columns]
+        chunk_summary = {**base_summary, "fields": fields, "field_names": columns}
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "assistant", "content": f"""
+        Annotate the fields of the dataset summarized below. Only return a JSON list with one object per field
+        of the form {{"column": "...", "semantic_type": "...", "description": "..."}}.
+        {self.encoder.encode(chunk_summary, textgen_config.model)}
+        """},
+        ]
+        result = self.request_json(messages, text_gen, textgen_config)
+        if isinstance(result, dict):
+            result = result.get("fields", [result])
+        annotations = {}
+        for field in result:
+            if not isinstance(field, dict) or field.get("column") not in columns:
+                continue
+            # accept the full summary format, with the annotations under properties
+            annotation = field.get("properties", field)
+            annotations[field["column"]] = {key: annotation[key] for key in ("semantic_type", "description")
+                                            if annotation.get(key)}
+        missing = [column for column in columns if column not in annotations]
+        if missing:
+            raise ValueError(f"The model did not annotate the fields {missing}")
+        return annotations
+
+    def enrich(self, base_summary: dict, text_gen: TextGenerator,
+               textgen_config: TextGenerationConfig, chunk_size: int = ENRICH_CHUNK_SIZE,
+               max_retries: int = ENRICH_RETRIES) -> dict:
+        """Enrich the data summary with descriptions.
+        The dataset description and the annotations of each chunk of fields are generated concurrently,
+        and only the requests that fail are retried. What still fails is recorded in the unenriched entry
+        of the summary, and enriching that summary again only requests the missing descriptions."""
+        logger.info(f"Enriching the data summary with descriptions")
+
+        unenriched = base_summary.get("unenriched") or {
+            "dataset": True, "fields": [field["column"] for field in base_summary["fields"]]}
+        columns = unenriched["fields"]
+        tasks = {}
+        if unenriched["dataset"]:
+            tasks[("dataset",)] = lambda: self.describe_dataset(base_summary, text_gen, textgen_config)
+        for start in range(0, len(columns), chunk_size):
+            chunk = tuple(columns[start:start + chunk_size])
+            tasks[chunk] = lambda chunk=chunk: self.describe_fields(base_summary, list(chunk), text_gen, textgen_config)
+
+        results, errors = {}, {}
+        pending = list(tasks)
+        for attempt in range(max_retries + 1):
+            with ThreadPoolExecutor(max_workers=min(ENRICH_CONCURRENCY, len(pending))) as pool:
+                futures = {key: pool.submit(tasks[key]) for key in pending}
+            for key, future in futures.items():
+                try:
+                    results[key] = future.result()
+                    errors.pop(key, None)
+                except Exception as error:
+                    errors[key] = error
+            pending = [key for key in pending if key not in results]
+            if not pending or attempt == max_retries:
+                break
+            logger.info(f"Retrying {len(pending)} of {len(tasks)} enrichment requests")
+
+        if tasks and len(errors) == len(tasks):
+            error_msg = ("The model did not return a valid JSON object while attempting to generate an enriched data summary. "
+                         f"Consider using a default summary or a larger model with higher max token length. | {next(iter(errors.values()))}")
             logger.info(error_msg)
-            print(response.text[0]["content"])
-            raise ValueError(error_msg + "" + response.usage)
+            raise ValueError(error_msg)
+        for key, error in errors.items():
+            logger.warning(f"Could not enrich {'the dataset description' if key == ('dataset',) else list(key)}: {error}")
+
+        enriched_summary = {**base_summary, **results.get(("dataset",), {})}
+        annotations = {}
+        for key, result in results.items():
+            if key != ("dataset",):
+                annotations.update(result)
+        enriched_summary["fields"] = [
+            {**field, "properties": {**field["properties"], **annotations.get(field["column"], {})}}
+            for field in base_summary["fields"]]
+        enriched_summary.pop("unenriched", None)
+        if errors:
+            enriched_summary["unenriched"] = {
+                "dataset": ("dataset",) in errors,
+                "fields": [column for key in errors if key != ("dataset",) for column in key]}
         return enriched_summary
 
     def summarize(
             self, data: Union[pd.DataFrame, str],
             text_gen: TextGenerator, file_name="", n_samples: int = 3,
             textgen_config=TextGenerationConfig(n=1),
-            summary_method: str = "default", encoding: str = 'utf-8') -> dict:
-        """Summarize data from a pandas DataFrame or a file location"""
+            summary_method: str = "default", encoding: str = 'utf-8',
+            file_location: str = None, sketch: bool = False) -> dict:
+        """Summarize data from a pandas DataFrame or a file location.
+        When data is a sample, statistics are computed over the full dataset at file_location.
+        With sketch, unique counts and quantiles are estimated in constant memory per column."""
 
         # if data is a file path, read it into a pandas DataFrame, set file_name to the file name
         if isinstance(data, str):
             file_name = data.split("/")[-1]
+            file_location = data
             # modified to include encoding
             data = read_dataframe(data, encoding=encoding)
-        data_properties = self.get_column_properties(data, n_samples)
+        data_properties = self.get_column_properties(data, n_samples, sketch=sketch)
+
+        kinds = {field["column"]: field["properties"]["dtype"] for field in data_properties}
+        if file_location is not None:
+            # min/max/std/unique counts of the full file, the sample is only used for plotting
+            self.statistics = DatasetStatistics.from_file(file_location, kinds, encoding=encoding, sketch=sketch)
+            data_properties = self.apply_full_statistics(data_properties, self.statistics, sample_size=len(data))
+        else:
+            # kept so appended rows can be folded in later without the rows seen so far
+            self.statistics = DatasetStatistics(kinds, sketch=sketch)
+            self.statistics.update(data)
+        n_rows = self.statistics.n_rows
 
         
         # default single stage summary construction
@@ -174,5 +447,47 @@ class Summarizer():
 
         data_summary["field_names"] = data.columns.tolist()
         data_summary["file_name"] = file_name
+        data_summary["n_rows"] = n_rows
+        data_summary["sample_size"] = len(data)
+
+        return data_summary
+
+    def schema_changed(self, summary: dict, new_rows: pd.DataFrame) -> bool:
+        """Check whether new rows have other columns, or numeric columns where the summary has none, than a summary"""
+        if set(new_rows.columns) != set(summary["field_names"]):
+            return True
+        new_kinds = {field["column"]: field["properties"]["dtype"]
+                     for field in self.get_column_properties(new_rows, n_samples=0)}
+        for field in summary.get("fields") or []:
+            if (field["properties"]["dtype"] == "number") != (new_kinds[field["column"]] == "number"):
+                return True
+        return False
+
+    def update(self, summary: dict, new_rows: pd.DataFrame, statistics: DatasetStatistics = None) -> dict:
+        """
+        Update a summary with rows appended to its dataset, folding only the new rows into the
+        statistics of the rows seen so far. Names, descriptions and semantic types are kept.
+
+        Args:
+            summary (dict): The summary of the dataset before the rows were appended.
+            new_rows (pd.DataFrame): The appended rows.
+            statistics (DatasetStatistics, optional): The statistics of the dataset before the rows were
+                appended. Defaults to the statistics of the last summarized dataset.
+
+        Returns:
+            dict: The updated summary. The statistics are updated in place.
+        """
+        statistics = statistics or self.statistics
+        if statistics is None:
+            raise ValueError("No statistics to update, summarize the dataset first")
+        new_rows = clean_column_names(new_rows)
+        if self.schema_changed(summary, new_rows):
+            raise ValueError("The schema of the new rows differs from the summary, summarize the dataset again")
 
-        return data_summary
\ No newline at end of file
+        statistics.update(new_rows)
+        updated_summary = copy.deepcopy(summary)
+        if updated_summary.get("fields"):
+            updated_summary["fields"] = self.apply_full_statistics(updated_summary["fields"], statistics)
+        updated_summary["n_rows"] = statistics.n_rows
+        self.statistics = statistics
+        return updated_summary
\ No newline at end of file
@@ -0,0 +1,170 @@
+import logging
+import os
+import shutil
+from typing import Any, List, Optional
+
+import pandas as pd
+
+from ntviz.datacache import file_fingerprint, get_cache_dir, dataframe_fingerprint, maybe_prune_cache
+from ntviz.utils import get_date_columns, materialize_dataframe, read_dataframe
+
+logger = logging.getLogger("ntviz")
+
+# suffix of the column holding the year of a date partition column
+YEAR_SUFFIX = "__year"
+
+
+def detect_partition_column(df: pd.DataFrame, summary: Any, max_partitions: int = 64) -> Optional[str]:
+    """
+    Pick the column to partition a dataset on. The primary date column (partitioned by year) is
+    preferred, otherwise the category column with the most values that still fits max_partitions.
+
+    Args:
+        df (pd.DataFrame): The dataset.
+        summary (Any): A Summary object or summary dictionary of the dataset.
+        max_partitions (int, optional): Maximum number of partitions. Defaults to 64.
+
+    Returns:
+        Optional[str]: The partition column, or None if no column splits the data usefully.
+    """
+    date_columns = [column for column in get_date_columns(summary) if column in df.columns]
+    if date_columns:
+        time_column = max(date_columns, key=lambda column: df[column].nunique())
+        years = pd.to_datetime(df[time_column], errors="coerce").dt.year.nunique()
+        if 1 < years <= max_partitions:
+            return time_column
+
+    fields = summary.get("fields") if isinstance(summary, dict) else getattr(summary, "fields", None)
+    candidates = [field["column"] for field in fields or []
+                  if field.get("properties", {}).get("dtype") in ("category", "string")
+                  and field["column"] in df.columns]
+    candidates = [column for column in candidates if 1 < df[column].nunique() <= max_partitions]
+    if candidates:
+        return max(candidates, key=lambda column: df[column].nunique())
+    return None
+
+
+class PartitionedDataset(object):
+    """A dataset stored as parquet partitioned on a time or category column, read with partition pruning"""
+
+    def __init__(self, data: pd.DataFrame, partition_column: str, key: Optional[str] = None) -> None:
+        """
+        Write the dataset to the partition cache, unless it is already cached.
+
+        Args:
+            data (pd.DataFrame): The full dataset, with date columns parsed.
+            partition_column (str): Column to partition on. Date columns are partitioned by year.
+            key (str, optional): Fingerprint of the dataset. Computed from the content if None.
+        """
+        self.partition_column = partition_column
+        self.is_date = pd.api.types.is_datetime64_any_dtype(data[partition_column])
+        self.key_column = partition_column + YEAR_SUFFIX if self.is_date else partition_column
+        self.dtypes = data.dtypes
+        key = key or dataframe_fingerprint(data)
+        self.path = os.path.join(get_cache_dir("partitions"), f"{key}_{partition_column}")
+        if not os.path.exists(self.path):
+            self._write(data)
+            maybe_prune_cache()
+        else:
+            # keeps the partitions of datasets in use out of the least recently used entries of the cache
+            os.utime(self.path)
+
+    @classmethod
+    def from_file(cls, file_location: str, summary: Any, partition_column: Optional[str] = None,
+                  max_partitions: int = 64) -> Optional["PartitionedDataset"]:
+        """
+        Partition all rows of a file on the given or detected partition column.
+
+        Args:
+            file_location (str): The path to the file.
+            summary (Any): A Summary object or summary dictionary of the file.
+            partition_column (str, optional): Column to partition on. Detected if None.
+            max_partitions (int, optional): Maximum number of partitions of a detected column. Defaults to 64.
+
+        Returns:
+            Optional[PartitionedDataset]: The partitioned dataset, or None if no partition column was found.
+        """
+        data = materialize_dataframe(read_dataframe(file_location, max_rows=None), summary)
+        partition_column = partition_column or detect_partition_column(data, summary, max_partitions)
+        if partition_column is None:
+            logger.info(f"No partition column found for {file_location}")
+            return None
+        key = file_fingerprint(file_location)
+        return cls(data, partition_column, key=key)
+
+    def _write(self, data: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        partitioned = data
+        if self.is_date:
+            partitioned = data.assign(**{self.key_column: data[self.partition_column].dt.year.astype("Int64")})
+        tmp_path = f"{self.path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        pq.write_to_dataset(pa.Table.from_pandas(partitioned, preserve_index=False), tmp_path,
+                            partition_cols=[self.key_column])
+        os.replace(tmp_path, self.path)
+        logger.info(f"Partitioned dataset on {self.partition_column} into {self.path}")
+
+    def _pruning_filters(self, filters: List[tuple]) -> List[tuple]:
+        # date filters are mirrored on the year column so whole years are skipped
+        pruning = []
+        for column, op, value in filters:
+            if column != self.partition_column or not self.is_date:
+                continue
+            if op in ("in", "not in"):
+                if op == "in":
+                    pruning.append((self.key_column, "in", sorted({pd.Timestamp(v).year for v in value})))
+            elif op in (">", ">="):
+                pruning.append((self.key_column, ">=", pd.Timestamp(value).year))
+            elif op in ("<", "<="):
+                pruning.append((self.key_column, "<=", pd.Timestamp(value).year))
+            elif op in ("=", "=="):
+                pruning.append((self.key_column, "==", pd.Timestamp(value).year))
+        return pruning
+
+    def _typed_filters(self, filters: List[tuple]) -> List[tuple]:
+        # compare date columns with timestamps rather than strings
+        typed = []
+        for column, op, value in filters:
+            if column in self.dtypes and pd.api.types.is_datetime64_any_dtype(self.dtypes[column]):
+                value = [pd.Timestamp(v) for v in value] if op in ("in", "not in") else pd.Timestamp(value)
+            typed.append((column, op, value))
+        return typed
+
+    def scan(self, filters: Optional[List[tuple]] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Read the rows of the full dataset matching the filters. Only the partitions the filters
+        can match are read, e.g. scan([("Date", ">=", "2017-01-01")]) skips every earlier year.
+
+        Args:
+            filters (List[tuple], optional): Filters of the form (column, op, value), op is one of
+                ==, !=, <, <=, >, >=, in, not in. All filters must hold. Defaults to None (all rows).
+            columns (List[str], optional): Columns to read. Defaults to None (all columns).
+
+        Returns:
+            pd.DataFrame: The matching rows.
+        """
+        filters = self._typed_filters(list(filters or []))
+        filters = filters + self._pruning_filters(filters)
+        read_columns = None
+        if columns is not None:
+            read_columns = list(dict.fromkeys(list(columns) + [self.partition_column]))
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(self.path, filters=filters or None, columns=read_columns)
+        if self.is_date and self.key_column in table.column_names:
+            table = table.drop([self.key_column])
+        df = table.to_pandas()
+
+        if not self.is_date and self.partition_column in df.columns:
+            # hive partition values come back as categories of strings
+            df[self.partition_column] = df[self.partition_column].astype(self.dtypes[self.partition_column])
+        # the partition column is read back last, restore the column order of the dataset
+        columns = columns if columns is not None else [column for column in self.dtypes.index if column in df.columns]
+        return df[list(columns)].reset_index(drop=True)
+
+    def partitions(self) -> List[str]:
+        """The values of the partition key that have a partition"""
+        prefix = f"{self.key_column}="
+        return sorted(name[len(prefix):] for name in os.listdir(self.path) if name.startswith(prefix))
@@ -3,6 +3,7 @@ import logging
 from ntviz.utils import clean_code_snippet
 from llmx import TextGenerator
 from ntviz.datamodel import Persona, TextGenerationConfig
+from ntviz.components.encoder import SummaryEncoder, SUMMARY_TOKEN_BUDGET
 
 
 system_prompt = """You are an experienced data analyst  who can take a dataset summary and generate a list of n personas (e.g., ceo or accountant for finance related data, economist for population or gdp related data, doctors for health data, or just users) that might be critical stakeholders in exploring some data and describe rationale for why they are critical. The personas should be prioritized based on their relevance to the data. Think step by step.
@@ -17,15 +18,15 @@ logger = logging.getLogger("lida")
 class PersonaExplorer():
     """Generate personas given a summary of data"""
 
-    def __init__(self) -> None:
-        pass
+    def __init__(self, token_budget: int = SUMMARY_TOKEN_BUDGET) -> None:
+        self.encoder = SummaryEncoder(token_budget)
 
     def generate(self, summary: dict, textgen_config: TextGenerationConfig,
                  text_gen: TextGenerator, n=5) -> list[Persona]:
         """Generate personas given a summary of data"""
 
         user_prompt = f"""The number of PERSONAs to generate is {n}. Generate {n} personas in the right format given the data summary below,\n .
-        {summary} \n""" + """
+        {self.encoder.encode(summary, textgen_config.model)} \n""" + """
 
         .
         """
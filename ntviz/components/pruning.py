@@ -0,0 +1,112 @@
+import logging
+import re
+from dataclasses import asdict, is_dataclass
+from typing import Any, List, Optional
+
+import pandas as pd
+
+from ntviz.datamodel import Goal
+
+logger = logging.getLogger("ntviz")
+
+# words of field names too generic to match a goal on their own
+GENERIC_WORDS = {"with", "from", "over", "than", "that", "this", "what", "which", "each", "total", "number",
+                 "count", "value", "values", "data", "name", "type"}
+
+
+def normalize_name(text: str) -> str:
+    """Lowercase text with every run of non-alphanumeric characters turned into one space"""
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", str(text).lower()).split())
+
+
+def referenced_fields(goal: Goal, field_names: List[str]) -> List[str]:
+    """
+    Find the fields a goal refers to in its question or visualization. A field matches on its full
+    name, ignoring case and punctuation, or on any distinctive word of its name, so Horsepower_HP_
+    matches "horsepower" and City_Miles_Per_Gallon matches "city mileage".
+
+    Args:
+        goal (Goal): The goal.
+        field_names (List[str]): The fields of the dataset.
+
+    Returns:
+        List[str]: The referenced fields, in dataset order.
+    """
+    text = f" {normalize_name(goal.question)} {normalize_name(goal.visualization)} "
+    words = set(text.split())
+
+    def matches(name):
+        normalized = normalize_name(name)
+        if not normalized:
+            return False
+        if f" {normalized} " in text:
+            return True
+        return any(len(word) >= 4 and word not in GENERIC_WORDS and word in words for word in normalized.split())
+
+    return [name for name in field_names if matches(name)]
+
+
+def correlated_neighbours(data: pd.DataFrame, columns: List[str], n_neighbours: int = 2,
+                          min_correlation: float = 0.5) -> List[str]:
+    """
+    Find the numeric fields most correlated with the given fields.
+
+    Args:
+        data (pd.DataFrame): The dataset.
+        columns (List[str]): The fields to find neighbours of.
+        n_neighbours (int, optional): Neighbours kept per field. Defaults to 2.
+        min_correlation (float, optional): Minimum absolute Pearson correlation of a neighbour. Defaults to 0.5.
+
+    Returns:
+        List[str]: The neighbours that are not in columns.
+    """
+    numeric = data.select_dtypes("number")
+    neighbours = []
+    for column in columns:
+        if column not in numeric.columns or numeric.shape[1] < 2:
+            continue
+        correlations = numeric.drop(columns=[column]).corrwith(numeric[column]).abs()
+        correlations = correlations[correlations >= min_correlation].nlargest(n_neighbours)
+        neighbours.extend(name for name in correlations.index if name not in columns and name not in neighbours)
+    return neighbours
+
+
+class FieldPruner(object):
+    """Restrict the profiles of a summary to the fields a goal refers to, plus their most correlated fields"""
+
+    def __init__(self, n_neighbours: int = 2, min_correlation: float = 0.5) -> None:
+        """
+        Args:
+            n_neighbours (int, optional): Correlated fields added per referenced field. Defaults to 2.
+            min_correlation (float, optional): Minimum absolute correlation of an added field. Defaults to 0.5.
+        """
+        self.n_neighbours = n_neighbours
+        self.min_correlation = min_correlation
+
+    def prune(self, summary: Any, goal: Goal, data: Optional[pd.DataFrame] = None) -> Any:
+        """
+        Mark the fields of a summary whose profiles a goal needs. The other fields are kept, and are
+        only listed by name when the summary is encoded.
+
+        Args:
+            summary (Any): A Summary object or summary dictionary.
+            goal (Goal): The goal the summary is sent with.
+            data (pd.DataFrame, optional): The dataset, used to add correlated fields. Defaults to None.
+
+        Returns:
+            Any: A summary dictionary with the needed fields in detailed_fields, or the summary unchanged
+                if the goal names no field.
+        """
+        if isinstance(summary, str):
+            return summary
+        summary = asdict(summary) if is_dataclass(summary) else dict(summary)
+        fields = summary.get("fields") or []
+        field_names = [field["column"] for field in fields]
+        columns = referenced_fields(goal, field_names)
+        if not columns:
+            return summary
+        if data is not None and self.n_neighbours:
+            columns += correlated_neighbours(data[[name for name in field_names if name in data.columns]],
+                                             columns, self.n_neighbours, self.min_correlation)
+        logger.info(f"Sending the profiles of {len(columns)} of {len(fields)} fields for goal: {goal.question}")
+        return {**summary, "detailed_fields": [name for name in field_names if name in columns]}
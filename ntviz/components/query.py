@@ -0,0 +1,85 @@
+import logging
+from typing import Union
+
+import pandas as pd
+
+from ntviz.utils import clean_column_name, read_dataframe
+
+logger = logging.getLogger("ntviz")
+
+
+class QueryEngine(object):
+    """Run SQL over the full dataset in an embedded DuckDB database"""
+
+    def __init__(self, data: Union[str, pd.DataFrame], table_name: str = "dataset") -> None:
+        """
+        Load a dataset into an in-memory DuckDB database.
+
+        Args:
+            data (Union[str, pd.DataFrame]): File path or DataFrame holding the full dataset.
+            table_name (str, optional): Name of the table the dataset is registered as. Defaults to "dataset".
+        """
+        try:
+            import duckdb
+        except ImportError as import_error:
+            raise ImportError(
+                "The duckdb backend requires the duckdb package. Install it with `pip install duckdb`.") from import_error
+
+        self.table_name = table_name
+        self.connection = duckdb.connect()
+        if isinstance(data, str):
+            self._load_file(data)
+        else:
+            self._load_frame(data)
+
+    def _load_file(self, file_location: str) -> None:
+        file_extension = file_location.split('.')[-1]
+        path = file_location.replace("'", "''")
+
+        if file_extension in ('csv', 'tsv'):
+            # take the header from pandas so columns match read_dataframe (e.g. "Unnamed: 0")
+            sep = '\t' if file_extension == 'tsv' else ','
+            names = [clean_column_name(str(name)) for name in pd.read_csv(file_location, sep=sep, nrows=0).columns]
+            names_list = ", ".join(f"'{name}'" for name in names)
+            source = f"read_csv_auto('{path}', header=true, delim='{sep}', names=[{names_list}])"
+            select = "*"
+        elif file_extension in ('parquet', 'json'):
+            source = f"read_parquet('{path}')" if file_extension == 'parquet' else f"read_json_auto('{path}')"
+            columns = [column[0] for column in self.connection.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()]
+            select = ", ".join(
+                '"{}" AS "{}"'.format(name.replace('"', '""'), clean_column_name(name)) for name in columns)
+        else:
+            # formats duckdb cannot scan natively are loaded through pandas
+            self._load_frame(read_dataframe(file_location, max_rows=None))
+            return
+
+        self.connection.execute(f"CREATE TABLE {self.table_name} AS SELECT {select} FROM {source}")
+        logger.info(f"Loaded {file_location} into duckdb table {self.table_name}")
+
+    def _load_frame(self, df: pd.DataFrame) -> None:
+        self.connection.register("_source_frame", df)
+        self.connection.execute(f"CREATE TABLE {self.table_name} AS SELECT * FROM _source_frame")
+        self.connection.unregister("_source_frame")
+
+    def append(self, df: pd.DataFrame) -> None:
+        """Insert rows appended to the dataset into its table, matching columns by name"""
+        self.connection.register("_new_rows", df)
+        self.connection.execute(f"INSERT INTO {self.table_name} BY NAME SELECT * FROM _new_rows")
+        self.connection.unregister("_new_rows")
+
+    @property
+    def relation(self):
+        """The DuckDB relation of the dataset table"""
+        return self.connection.table(self.table_name)
+
+    def sql(self, query: str) -> pd.DataFrame:
+        """
+        Run a SQL query against the dataset.
+
+        Args:
+            query (str): DuckDB SQL query, the dataset is available as the table `dataset`.
+
+        Returns:
+            pd.DataFrame: The query result.
+        """
+        return self.connection.execute(query).df()
@@ -0,0 +1,105 @@
+import logging
+from typing import Dict, Optional
+
+import pandas as pd
+
+logger = logging.getLogger("ntviz")
+
+# period of each level of the pyramid and the level it is rolled up from
+ROLLUP_LEVELS = {"day": "D", "week": "W", "month": "M", "quarter": "Q", "year": "Y"}
+ROLLUP_PARENTS = {"week": "day", "month": "day", "quarter": "month", "year": "month"}
+# aggregations that can be answered from the partial aggregates stored in the pyramid
+ROLLUP_AGGREGATIONS = ["count", "sum", "mean", "min", "max"]
+
+
+class TimeRollups(object):
+    """Pyramids of day, week, month, quarter and year aggregates of the numeric columns of a dataset"""
+
+    def __init__(self, data: pd.DataFrame) -> None:
+        """
+        Initialize an empty rollup cache for a dataset.
+
+        Args:
+            data (pd.DataFrame): The dataset, with date columns parsed.
+        """
+        self.data = data
+        self.pyramids: Dict[tuple, Dict[str, pd.DataFrame]] = {}
+        self.results: Dict[tuple, pd.DataFrame] = {}
+
+    def pyramid(self, date_column: str, value: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Get the rollup pyramid of a column along a date column, building it on first use.
+        Each level holds the count, sum, min and max of every period and is rolled up from the
+        level below it rather than from the raw rows.
+
+        Args:
+            date_column (str): The date column.
+            value (str, optional): The numeric column. Only rows are counted if None.
+
+        Returns:
+            Dict[str, pd.DataFrame]: Partial aggregates indexed by period start, keyed by level.
+        """
+        key = (date_column, value)
+        if key in self.pyramids:
+            return self.pyramids[key]
+
+        logger.info(f"Building rollup pyramid of {value or 'rows'} by {date_column}")
+        dates = self.data[date_column]
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates, errors="coerce")
+        days = dates.dt.floor("D")
+        if value is None:
+            base = days.groupby(days).size().to_frame("count")
+        else:
+            base = self.data[value].groupby(days).agg(["count", "sum", "min", "max"])
+        levels = {"day": base}
+        for level in ("week", "month", "quarter", "year"):
+            parent = levels[ROLLUP_PARENTS[level]]
+            periods = parent.index.to_period(ROLLUP_LEVELS[level]).start_time
+            levels[level] = parent.groupby(periods).agg(
+                {column: "sum" if column in ("count", "sum") else column for column in parent.columns})
+        self.pyramids[key] = levels
+        return levels
+
+    def rollup(self, date_column: str, value: Optional[str] = None, freq: str = "month",
+               agg: str = "mean") -> pd.DataFrame:
+        """
+        Aggregate a column per period of a date column, e.g. rollup("date", "temp_max", "week", "mean").
+        count, sum, mean, min and max are read from the pre-aggregated pyramid, other aggregations
+        are computed from the rows and memoized. Periods without rows are left out.
+
+        Args:
+            date_column (str): The date column.
+            value (str, optional): The numeric column to aggregate. Rows are counted if None.
+            freq (str, optional): One of day, week, month, quarter or year. Defaults to "month".
+            agg (str, optional): Aggregation such as count, sum, mean, min, max, median or std.
+                Defaults to "mean".
+
+        Returns:
+            pd.DataFrame: One row per period with the period start in date_column and the aggregated value column.
+        """
+        if freq not in ROLLUP_LEVELS:
+            raise ValueError(f"Unsupported freq {freq}. Choose from {', '.join(ROLLUP_LEVELS)}.")
+        agg = agg if value is not None else "count"
+        key = (date_column, value, freq, agg)
+        if key in self.results:
+            return self.results[key].copy()
+
+        name = value or "count"
+        if agg in ROLLUP_AGGREGATIONS:
+            level = self.pyramid(date_column, value)[freq]
+            if agg == "mean":
+                result = level["sum"] / level["count"].where(level["count"] > 0)
+            else:
+                result = level[agg]
+        else:
+            dates = self.data[date_column]
+            if not pd.api.types.is_datetime64_any_dtype(dates):
+                dates = pd.to_datetime(dates, errors="coerce")
+            periods = dates.dt.to_period(ROLLUP_LEVELS[freq]).dt.start_time
+            result = self.data[value].groupby(periods).agg(agg)
+
+        result = result.rename(name).rename_axis(date_column)
+        self.results[key] = result.reset_index()
+        # generated code may modify the result in place
+        return self.results[key].copy()
@@ -0,0 +1,107 @@
+import math
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class HyperLogLog(object):
+    """
+    HyperLogLog distinct count sketch over 64-bit value hashes.
+    With precision p it uses 2^p one-byte registers, and the relative standard error of the estimate
+    is 1.04 / sqrt(2^p), about 1.6% for the default p=12 (4 KiB per column).
+    """
+
+    def __init__(self, p: int = 12) -> None:
+        self.p = p
+        self.registers = np.zeros(2 ** p, dtype=np.uint8)
+
+    def update(self, series: pd.Series) -> None:
+        """Add the non-null values of a column"""
+        hashes = pd.util.hash_pandas_object(series.dropna(), index=False).to_numpy()
+        if len(hashes) == 0:
+            return
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.intp)
+        # rank = position of the first set bit after the p index bits
+        rest = (hashes << np.uint64(self.p)) >> np.uint64(11)
+        _, exponent = np.frexp(rest.astype(np.float64))
+        rank = np.where(rest == 0, 64 - self.p + 1, 53 - exponent + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """Fold another sketch of the same precision into this one"""
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        """Estimated number of distinct values"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class KLLSketch(object):
+    """
+    KLL quantile sketch of a numeric column, with memory bounded by about 3k values.
+    With the default k=200 the rank of a returned quantile is within about 1.65% of the
+    requested rank with 99% confidence, independently of the number of values.
+    """
+
+    def __init__(self, k: int = 200, seed: Optional[int] = 42) -> None:
+        self.k = k
+        self.n = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self) -> None:
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                items = np.sort(items)
+                # an odd item stays, every other of the rest is promoted with twice the weight
+                keep = items[:len(items) % 2]
+                promoted = items[len(keep):][self.rng.integers(2)::2]
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values: np.ndarray) -> None:
+        """Add the non-NaN values of a numeric array"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other: "KLLSketch") -> None:
+        """Fold another sketch into this one"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compress()
+
+    def quantiles(self, qs: List[float]) -> List[Optional[float]]:
+        """Estimated values at the quantiles qs (between 0 and 1), None if the sketch is empty"""
+        if self.n == 0:
+            return [None for _ in qs]
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        positions = np.searchsorted(cumulative, np.asarray(qs) * cumulative[-1], side="left")
+        return [float(items[order][min(position, len(items) - 1)]) for position in positions]
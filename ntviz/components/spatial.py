@@ -0,0 +1,156 @@
+import logging
+import math
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("ntviz")
+
+# geohash precisions the index is built at, from continents (1) down to streets (7)
+GEOHASH_PRECISIONS = range(1, 8)
+LATITUDE_NAMES = ("lat", "latitude")
+LONGITUDE_NAMES = ("lon", "lng", "long", "longitude")
+
+
+def detect_coordinates(df: pd.DataFrame, summary: Any) -> Optional[Tuple[str, str]]:
+    """
+    Find the latitude and longitude columns of a dataset, from the semantic types in its summary
+    or else from the column names.
+
+    Args:
+        df (pd.DataFrame): The dataset.
+        summary (Any): A Summary object or summary dictionary of the dataset.
+
+    Returns:
+        Optional[Tuple[str, str]]: The latitude and longitude columns, or None if the dataset has no coordinates.
+    """
+    fields = summary.get("fields") if isinstance(summary, dict) else getattr(summary, "fields", None)
+    semantic_types = {field["column"]: str(field.get("properties", {}).get("semantic_type", "")).lower()
+                      for field in fields or []}
+
+    def find(names):
+        numeric = [column for column in df.columns if pd.api.types.is_numeric_dtype(df[column])]
+        return (next((column for column in numeric if semantic_types.get(column) in names), None)
+                or next((column for column in numeric if column.lower() in names), None))
+
+    lat_column, lon_column = find(LATITUDE_NAMES), find(LONGITUDE_NAMES)
+    if lat_column is None or lon_column is None:
+        return None
+    return lat_column, lon_column
+
+
+class SpatialIndex(object):
+    """Geohash grid cells of the coordinates of a dataset at several resolutions, with memoized per-cell aggregates"""
+
+    def __init__(self, data: pd.DataFrame, lat_column: str, lon_column: str) -> None:
+        """
+        Assign every row to its geohash cell at each precision.
+
+        Args:
+            data (pd.DataFrame): The dataset.
+            lat_column (str): The latitude column, in degrees.
+            lon_column (str): The longitude column, in degrees.
+        """
+        self.data = data
+        self.lat_column = lat_column
+        self.lon_column = lon_column
+        lat = pd.to_numeric(data[lat_column], errors="coerce").to_numpy(dtype=float)
+        lon = pd.to_numeric(data[lon_column], errors="coerce").to_numpy(dtype=float)
+        self.valid = ~np.isnan(lat) & ~np.isnan(lon) & (np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+
+        self.cells: Dict[int, np.ndarray] = {}
+        for precision in GEOHASH_PRECISIONS:
+            lat_bits, lon_bits = self.bits(precision)
+            # a geohash of n characters splits longitude into ceil(5n/2) and latitude into floor(5n/2) bits
+            lat_cell = np.clip(np.floor((lat + 90) / 180 * 2 ** lat_bits), 0, 2 ** lat_bits - 1)
+            lon_cell = np.clip(np.floor((lon + 180) / 360 * 2 ** lon_bits), 0, 2 ** lon_bits - 1)
+            cells = np.where(self.valid, lat_cell * 2 ** lon_bits + lon_cell, -1)
+            self.cells[precision] = cells.astype(np.int64)
+        self.results: Dict[tuple, pd.DataFrame] = {}
+
+    @classmethod
+    def from_summary(cls, data: pd.DataFrame, summary: Any) -> Optional["SpatialIndex"]:
+        """Build the index on the coordinates of a dataset, or return None if it has none"""
+        coordinates = detect_coordinates(data, summary)
+        if coordinates is None:
+            return None
+        logger.info(f"Building spatial index on {coordinates}")
+        return cls(data, *coordinates)
+
+    @staticmethod
+    def bits(precision: int) -> Tuple[int, int]:
+        return 5 * precision // 2, math.ceil(5 * precision / 2)
+
+    def choose_precision(self, bounds: Optional[Tuple[float, float, float, float]] = None,
+                         max_bins: int = 2000) -> int:
+        """
+        Pick the finest precision whose cells over the bounds number at most max_bins.
+
+        Args:
+            bounds (Tuple[float, float, float, float], optional): (min_lat, min_lon, max_lat, max_lon)
+                of the map. Defaults to the extent of the data.
+            max_bins (int, optional): Maximum number of cells to draw. Defaults to 2000.
+        """
+        if bounds is None:
+            lat = self.data[self.lat_column][self.valid]
+            lon = self.data[self.lon_column][self.valid]
+            if lat.empty:
+                return min(GEOHASH_PRECISIONS)
+            bounds = (lat.min(), lon.min(), lat.max(), lon.max())
+        min_lat, min_lon, max_lat, max_lon = bounds
+        chosen = min(GEOHASH_PRECISIONS)
+        for precision in GEOHASH_PRECISIONS:
+            lat_bits, lon_bits = self.bits(precision)
+            n_cells = ((max_lat - min_lat) / (180 / 2 ** lat_bits) + 1) * ((max_lon - min_lon) / (360 / 2 ** lon_bits) + 1)
+            if n_cells > max_bins:
+                break
+            chosen = precision
+        return chosen
+
+    def bins(self, value: Optional[str] = None, agg: str = "mean", precision: Optional[int] = None,
+             bounds: Optional[Tuple[float, float, float, float]] = None, max_bins: int = 2000) -> pd.DataFrame:
+        """
+        Aggregate the rows per grid cell, e.g. bins("confirmed", "sum") for a map of binned totals.
+
+        Args:
+            value (str, optional): Column to aggregate. Rows are counted if None.
+            agg (str, optional): Aggregation such as count, sum, mean, median, min or max. Defaults to "mean".
+            precision (int, optional): Geohash precision from 1 (coarse) to 7 (fine).
+                Defaults to the finest precision that gives at most max_bins cells over the bounds.
+            bounds (Tuple[float, float, float, float], optional): Only keep cells inside
+                (min_lat, min_lon, max_lat, max_lon). Defaults to all cells.
+            max_bins (int, optional): Maximum number of cells when choosing the precision. Defaults to 2000.
+
+        Returns:
+            pd.DataFrame: One row per non-empty cell with the cell center in the latitude and longitude
+                columns, the number of rows in "count" and the aggregated value column.
+        """
+        precision = precision or self.choose_precision(bounds, max_bins)
+        if precision not in self.cells:
+            raise ValueError(f"Unsupported precision {precision}. Choose from {min(GEOHASH_PRECISIONS)} to {max(GEOHASH_PRECISIONS)}.")
+        agg = agg if value is not None else "count"
+        key = (value, agg, precision)
+        if key not in self.results:
+            cells = pd.Series(self.cells[precision], index=self.data.index)
+            frame = pd.DataFrame({"cell": cells})
+            if value is not None:
+                frame[value] = self.data[value]
+            grouped = frame[self.valid].groupby("cell")
+            result = grouped.size().rename("count").to_frame()
+            if value is not None:
+                result[value] = grouped[value].agg(agg)
+
+            lat_bits, lon_bits = self.bits(precision)
+            lat_cell, lon_cell = np.divmod(result.index.to_numpy(), 2 ** lon_bits)
+            result.insert(0, self.lat_column, (lat_cell + 0.5) * 180 / 2 ** lat_bits - 90)
+            result.insert(1, self.lon_column, (lon_cell + 0.5) * 360 / 2 ** lon_bits - 180)
+            self.results[key] = result.reset_index(drop=True)
+
+        result = self.results[key]
+        if bounds is not None:
+            min_lat, min_lon, max_lat, max_lon = bounds
+            result = result[result[self.lat_column].between(min_lat, max_lat)
+                            & result[self.lon_column].between(min_lon, max_lon)].reset_index(drop=True)
+        # generated code may modify the result in place
+        return result.copy()
@@ -0,0 +1,168 @@
+import logging
+import math
+import warnings
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ntviz.utils import clean_column_names, read_dataframe
+from .sketches import HyperLogLog, KLLSketch
+
+logger = logging.getLogger("ntviz")
+
+
+class ColumnStatistics(object):
+    """Mergeable statistics of a single column"""
+
+    def __init__(self, kind: str, sketch: bool = False) -> None:
+        """
+        Args:
+            kind (str): The summary dtype of the column. Moments and a quantile sketch are tracked for
+                "number", min and max for "number" and "date", distinct values for every column.
+            sketch (bool, optional): Estimate the distinct values with HyperLogLog in constant memory
+                instead of keeping them in a set. Defaults to False. The set is not persisted: pickled
+                statistics hold a HyperLogLog of it, so they estimate distinct values once loaded.
+        """
+        self.kind = kind
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.distinct = HyperLogLog() if sketch else set()
+        self.quantile_sketch = KLLSketch() if kind == "number" else None
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        if isinstance(self.distinct, set):
+            # the distinct values of a column are unbounded, persist a fixed size sketch of them
+            state["distinct"] = HyperLogLog()
+            state["distinct"].update(pd.Series(list(self.distinct)))
+        return state
+
+    def update(self, series: pd.Series) -> None:
+        """Fold a chunk of the column into the statistics"""
+        if self.kind == "number":
+            series = pd.to_numeric(series, errors="coerce")
+            count = int(series.count())
+            if count:
+                mean = float(series.mean())
+                m2 = float(series.var(ddof=0)) * count
+                self._merge_moments(count, mean, m2)
+                self.quantile_sketch.update(series.to_numpy(dtype=float, na_value=np.nan))
+        elif self.kind == "date" and not pd.api.types.is_datetime64_any_dtype(series):
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                series = pd.to_datetime(series, errors="coerce")
+
+        if self.kind in ("number", "date") and series.notnull().any():
+            self._merge_range(series.min(), series.max())
+        if isinstance(self.distinct, HyperLogLog):
+            self.distinct.update(series)
+        else:
+            self.distinct.update(series.dropna().unique().tolist())
+
+    def merge(self, other: "ColumnStatistics") -> None:
+        """Fold the statistics of another part of the column into these statistics"""
+        if other.count:
+            self._merge_moments(other.count, other.mean, other.m2)
+        if other.min is not None:
+            self._merge_range(other.min, other.max)
+        if isinstance(self.distinct, HyperLogLog):
+            self.distinct.merge(other.distinct)
+        else:
+            self.distinct.update(other.distinct)
+        if self.quantile_sketch is not None:
+            self.quantile_sketch.merge(other.quantile_sketch)
+
+    def _merge_moments(self, count: int, mean: float, m2: float) -> None:
+        # parallel variance update (Chan et al.)
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+
+    def _merge_range(self, minimum, maximum) -> None:
+        self.min = minimum if self.min is None else min(self.min, minimum)
+        self.max = maximum if self.max is None else max(self.max, maximum)
+
+    @property
+    def std(self) -> Optional[float]:
+        # sample standard deviation, like pandas
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else None
+
+    @property
+    def num_unique_values(self) -> int:
+        return self.distinct.estimate() if isinstance(self.distinct, HyperLogLog) else len(self.distinct)
+
+    def quantiles(self, qs: List[float]) -> List[Optional[float]]:
+        """Approximate quantiles of a numeric column, see KLLSketch for the error bound. Exact statistics
+        only keep exact distinct values, the quantiles of a streamed column are always approximate."""
+        return self.quantile_sketch.quantiles(qs)
+
+
+class DatasetStatistics(object):
+    """Mergeable statistics of every column of a dataset, computed in a single streaming pass"""
+
+    def __init__(self, kinds: Dict[str, str], sketch: bool = False) -> None:
+        """
+        Args:
+            kinds (Dict[str, str]): The summary dtype of each column, keyed by the cleaned column name.
+            sketch (bool, optional): Estimate distinct values with HyperLogLog. Defaults to False.
+        """
+        self.n_rows = 0
+        self.columns = {column: ColumnStatistics(kind, sketch=sketch) for column, kind in kinds.items()}
+
+    def update(self, df: pd.DataFrame) -> None:
+        """Fold a chunk of rows into the statistics"""
+        self.n_rows += len(df)
+        for column, statistics in self.columns.items():
+            if column in df.columns:
+                statistics.update(df[column])
+
+    @staticmethod
+    def iter_chunks(file_location: str, chunksize: int = 100000, encoding: str = 'utf-8') -> Iterator[pd.DataFrame]:
+        """
+        Read a file in chunks of rows with cleaned column names.
+        Formats that cannot be streamed are read in one piece.
+
+        Args:
+            file_location (str): The path to the file.
+            chunksize (int, optional): Number of rows per chunk. Defaults to 100000.
+            encoding (str, optional): Encoding of text files. Defaults to 'utf-8'.
+        """
+        file_extension = file_location.split('.')[-1]
+        if file_extension in ('csv', 'tsv'):
+            sep = '\t' if file_extension == 'tsv' else ','
+            for chunk in pd.read_csv(file_location, sep=sep, encoding=encoding, chunksize=chunksize):
+                yield clean_column_names(chunk)
+        elif file_extension == 'parquet':
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(file_location).iter_batches(batch_size=chunksize):
+                yield clean_column_names(batch.to_pandas())
+        else:
+            yield read_dataframe(file_location, encoding=encoding, max_rows=None)
+
+    @classmethod
+    def from_file(cls, file_location: str, kinds: Dict[str, str], chunksize: int = 100000,
+                  encoding: str = 'utf-8', sketch: bool = False) -> "DatasetStatistics":
+        """
+        Compute the statistics of a file in a single streaming pass.
+
+        Args:
+            file_location (str): The path to the file.
+            kinds (Dict[str, str]): The summary dtype of each column.
+            chunksize (int, optional): Number of rows read at a time. Defaults to 100000.
+            encoding (str, optional): Encoding of text files. Defaults to 'utf-8'.
+            sketch (bool, optional): Estimate distinct values with HyperLogLog. Defaults to False.
+
+        Returns:
+            DatasetStatistics: The statistics of the full file.
+        """
+        statistics = cls(kinds, sketch=sketch)
+        for chunk in cls.iter_chunks(file_location, chunksize=chunksize, encoding=encoding):
+            statistics.update(chunk)
+        logger.info(f"Computed statistics of {statistics.n_rows} rows from {file_location}")
+        return statistics
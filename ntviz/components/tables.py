@@ -0,0 +1,183 @@
+import logging
+import os
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from ntviz.utils import read_dataframe
+
+logger = logging.getLogger("ntviz")
+
+
+class MultiTableDataset(object):
+    """A set of related tables with detected join keys and pre-built join indexes"""
+
+    def __init__(self, tables: Dict[str, pd.DataFrame], name: str = "", min_overlap: float = 0.9) -> None:
+        """
+        Initialize the dataset and detect the join keys between its tables.
+
+        Args:
+            tables (Dict[str, pd.DataFrame]): Tables keyed by table name.
+            name (str, optional): Name of the dataset. Defaults to the joined table names.
+            min_overlap (float, optional): Minimum share of a column's values that must exist in
+                another table's key column for the two to be considered joinable. Defaults to 0.9.
+        """
+        self.tables = tables
+        self.name = name or "_".join(tables.keys())
+        self.min_overlap = min_overlap
+        self.indexes: Dict[tuple, pd.DataFrame] = {}
+        self.views: Dict[tuple, pd.DataFrame] = {}
+        self.relations = self.detect_keys()
+
+    @classmethod
+    def from_files(cls, file_locations: List[str], **kwargs) -> "MultiTableDataset":
+        """
+        Read all rows of each file into a table named after the file.
+
+        Args:
+            file_locations (List[str]): Paths to the files containing the tables.
+
+        Returns:
+            MultiTableDataset: The dataset built from the files.
+        """
+        tables = {
+            os.path.splitext(os.path.basename(file_location))[0]: read_dataframe(file_location, max_rows=None)
+            for file_location in file_locations}
+        return cls(tables, **kwargs)
+
+    def index(self, table: str, column: str) -> pd.DataFrame:
+        """
+        Get the hash index of a table on a key column, building it on first use.
+
+        Args:
+            table (str): Name of the table.
+            column (str): Key column of the table.
+
+        Returns:
+            pd.DataFrame: The table indexed by the key column.
+        """
+        if (table, column) not in self.indexes:
+            self.indexes[(table, column)] = self.tables[table].set_index(column)
+        return self.indexes[(table, column)]
+
+    def _is_key(self, table: str, column: str) -> bool:
+        series = self.tables[table][column]
+        is_key_dtype = pd.api.types.is_integer_dtype(series) or pd.api.types.is_object_dtype(series)
+        return is_key_dtype and series.notnull().all() and series.is_unique
+
+    @staticmethod
+    def _names_match(column: str, key_column: str) -> bool:
+        # same name (e.g. id -> id) or a foreign key into a generic id column (e.g. film_id -> id)
+        column, key_column = column.lower(), key_column.lower()
+        return column == key_column or (key_column == "id" and column.endswith("_id"))
+
+    def detect_keys(self) -> List[dict]:
+        """
+        Detect the columns that reference a unique key column of another table.
+
+        Returns:
+            List[dict]: Relations of the form {"table", "column", "key_table", "key_column", "overlap"}.
+        """
+        relations = []
+        for key_table, key_df in self.tables.items():
+            for key_column in key_df.columns:
+                if not self._is_key(key_table, key_column):
+                    continue
+                key_index = self.index(key_table, key_column).index
+                for table, df in self.tables.items():
+                    if table == key_table:
+                        continue
+                    for column in df.columns:
+                        if not self._names_match(column, key_column):
+                            continue
+                        values = df[column].dropna().unique()
+                        if len(values) == 0:
+                            continue
+                        overlap = float(key_index.isin(values).sum()) / len(values)
+                        if overlap >= self.min_overlap:
+                            relations.append({
+                                "table": table, "column": column,
+                                "key_table": key_table, "key_column": key_column,
+                                "overlap": overlap})
+        # a same-name match (id -> id) between two tables that also have an explicit
+        # foreign key (film_id -> id) is a coincidence of surrogate keys, not a relation
+        explicit_pairs = {frozenset((r["table"], r["key_table"])) for r in relations
+                          if r["column"].lower() != r["key_column"].lower()}
+        relations = [r for r in relations if r["column"].lower() != r["key_column"].lower()
+                     or frozenset((r["table"], r["key_table"])) not in explicit_pairs]
+        logger.info(f"Detected {len(relations)} join keys between {len(self.tables)} tables")
+        return relations
+
+    def join(self, table: str, key_table: str, how: str = "left") -> pd.DataFrame:
+        """
+        Join a table with a table it references, looking rows up in the pre-built key index.
+        The result is memoized, so repeated joins cost a dictionary lookup.
+
+        Args:
+            table (str): Name of the referencing table.
+            key_table (str): Name of the referenced table.
+            how (str, optional): "left" keeps unmatched rows, "inner" drops them. Defaults to "left".
+
+        Returns:
+            pd.DataFrame: The referencing table with the referenced table's columns appended.
+        """
+        if (table, key_table, how) in self.views:
+            return self.views[(table, key_table, how)]
+
+        relation = next((r for r in self.relations
+                         if r["table"] == table and r["key_table"] == key_table), None)
+        if relation is None:
+            raise ValueError(f"No join key detected between {table} and {key_table}")
+
+        view, _ = self._lookup(self.tables[table], relation["column"], key_table, relation["key_column"])
+        if how == "inner":
+            view = view[self.tables[table][relation["column"]].isin(
+                self.index(key_table, relation["key_column"]).index).values]
+        self.views[(table, key_table, how)] = view
+        return view
+
+    def _lookup(self, df: pd.DataFrame, column: str, key_table: str, key_column: str) -> tuple:
+        """Append the rows of key_table matching df[column], returning the view and its column names"""
+        looked_up = self.index(key_table, key_column).reindex(df[column].values)
+        looked_up.index = df.index
+        columns = {col: f"{key_table}_{col}" if col in df.columns else col for col in looked_up.columns}
+        looked_up.columns = list(columns.values())
+        columns[key_column] = column
+        return pd.concat([df, looked_up], axis=1), columns
+
+    def joined(self, base: Optional[str] = None) -> pd.DataFrame:
+        """
+        Get the pre-joined view of every table reachable from a base table through unique keys.
+        Only lookups into unique keys are followed, so the view has one row per base table row.
+
+        Args:
+            base (str, optional): Name of the base table. Defaults to the first table.
+
+        Returns:
+            pd.DataFrame: The joined view.
+        """
+        base = base or next(iter(self.tables))
+        if (base, None, "joined") in self.views:
+            return self.views[(base, None, "joined")]
+
+        view = self.tables[base]
+        # maps the columns of each joined table to their names in the view
+        columns = {base: {col: col for col in view.columns}}
+        changed = True
+        while changed:
+            changed = False
+            for relation in self.relations:
+                table, key_table = relation["table"], relation["key_table"]
+                if table in columns and key_table not in columns:
+                    view, columns[key_table] = self._lookup(
+                        view, columns[table][relation["column"]], key_table, relation["key_column"])
+                elif key_table in columns and table not in columns and self._is_key(table, relation["column"]):
+                    # one-to-one relation, look the referencing table up by its own key
+                    view, columns[table] = self._lookup(
+                        view, columns[key_table][relation["key_column"]], table, relation["column"])
+                else:
+                    continue
+                changed = True
+
+        self.views[(base, None, "joined")] = view
+        return view
@@ -1,5 +1,6 @@
 from llmx import TextGenerator, TextGenerationConfig, TextGenerationResponse
 from ..ntzscaff import ChartScaffold
+from ..encoder import SummaryEncoder, SUMMARY_TOKEN_BUDGET
 from ntviz.datamodel import Goal, Summary
 
 
@@ -12,13 +13,15 @@ class VizEditor(object):
     """Generate visualizations from prompt"""
 
     def __init__(
-        self,
+        self, token_budget: int = SUMMARY_TOKEN_BUDGET
     ) -> None:
         self.scaffold = ChartScaffold()
+        self.encoder = SummaryEncoder(token_budget)
 
     def generate(
             self, code: str, summary: Summary, instructions: list[str],
-            textgen_config: TextGenerationConfig, text_gen: TextGenerator, library='altair'):
+            textgen_config: TextGenerationConfig, text_gen: TextGenerator, library='altair',
+            backend: str = "pandas"):
         """Edit a code spec based on instructions"""
 
         instruction_string = ""
@@ -29,13 +32,13 @@ class VizEditor(object):
             index=0,
             question="",
             visualization="",
-            rationale=""), library)
+            rationale=""), library, backend)
         # print("instructions", instructions)
 
         messages = [
             {
                 "role": "system", "content": system_prompt}, {
-                "role": "system", "content": f"The dataset summary is : \n\n {summary} \n\n"}, {
+                "role": "system", "content": f"The dataset summary is : \n\n {self.encoder.encode(summary, textgen_config.model)} \n\n"}, {
                 "role": "system", "content": f"The modifications you make MUST BE CORRECT and  based on the '{library}' library and also follow these instructions \n\n{library_instructions} \n\n. The resulting code MUST use the following template \n\n {library_template} \n\n "}, {
                     "role": "user", "content": f"ALL ADDITIONAL LIBRARIES USED MUST BE IMPORTED.\n The code to be modified is: \n\n{code} \n\n. YOU MUST THINK STEP BY STEP, AND CAREFULLY MODIFY ONLY the content of the plot(..) method TO MEET EACH OF THE FOLLOWING INSTRUCTIONS: \n\n {instruction_string} \n\n. The completed modified code THAT FOLLOWS THE TEMPLATE above is. \n"}]
 
@@ -1,7 +1,8 @@
 import logging
 import json
 from ntviz.utils import clean_code_snippet
-from ..ntzscaff import ChartScaffold
+from ..ntzscaff import ChartScaffold, backend_instructions
+from ..encoder import SummaryEncoder, SUMMARY_TOKEN_BUDGET
 from llmx import TextGenerator, TextGenerationConfig, TextGenerationResponse
 # from lida.modules.scaffold import ChartScaffold
 from ntviz.datamodel import Goal, Summary
@@ -42,32 +43,35 @@ class VizRecommender(object):
     """Generate visualizations from prompt"""
 
     def __init__(
-        self,
+        self, token_budget: int = SUMMARY_TOKEN_BUDGET
     ) -> None:
         self.scaffold = ChartScaffold()
+        self.encoder = SummaryEncoder(token_budget)
 
     def generate(
             self, code: str, summary: Summary,
             textgen_config: TextGenerationConfig,
             text_gen: TextGenerator,
             n=3,
-            library='seaborn'):
+            library='seaborn',
+            backend: str = "pandas"):
         """Recommend a code spec based on existing visualization"""
 
         library_template, library_instructions = self.scaffold.get_template(Goal(
             index=0,
             question="",
             visualization="",
-            rationale=""), library)
+            rationale=""), library, backend)
 
         structure_instruction = f"""
         EACH CODE SNIPPET MUST BE A FULL PROGRAM (IT MUST IMPORT ALL THE LIBRARIES THAT ARE USED AND MUST CONTAIN plot(data) method). IT MUST FOLLOW THE STRUCTURE BELOW AND ONLY MODIFY THE INDICATED SECTIONS. \n\n {library_template} \n\n.
+        {backend_instructions[backend]}
         """
 
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "system", "content": structure_instruction},
-            {"role": "system", "content": f"The dataset summary is : \n\n {summary} \n\n"},
+            {"role": "system", "content": f"The dataset summary is : \n\n {self.encoder.encode(summary, textgen_config.model)} \n\n"},
             {"role": "system",
              "content":
              f"An example visualization code is: \n\n ```{code}``` \n\n. You MUST use only the {library} library. \n"},
@@ -1,8 +1,11 @@
 from dataclasses import asdict
 from typing import Dict
+import pandas as pd
 from llmx import TextGenerator, TextGenerationConfig, TextGenerationResponse
 
 from ..ntzscaff import ChartScaffold
+from ..encoder import SummaryEncoder, SUMMARY_TOKEN_BUDGET
+from ..pruning import FieldPruner
 from ntviz.datamodel import Goal
 
 
@@ -55,7 +58,7 @@ You are a highly skilled assistant specializing in writing CORRECT, EFFICIENT, a
    - If it is a predictive element:
         - Before training the model, a check is added to see if type (the target variable) contains NaN values. If so, those rows are dropped.
    - **Ensure the code DOES NOT cause common errors such as:**
-        - `UserWarning: Could not infer format...` (Caused by ambiguous datetime parsing – ensure format is specified when using datetime columns)
+        - `UserWarning: Could not infer format...` (Caused by ambiguous datetime parsing – fields with dtype `date` are already datetime64 and MUST NOT be parsed again; ensure format is specified when parsing any other column)
         - Not **Using incorrect parameters in Seaborn/Matplotlib functions** (e.g., `ha="right"` in `tick_params`) → Should Move to the correct function (e.g., `plt.xticks(rotation=45, ha="right")`).
 
 6. **Planning Requirement:**
@@ -78,19 +81,24 @@ class VizGenerator(object):
     """Generate visualizations from prompt"""
 
     def __init__(
-        self
+        self, token_budget: int = SUMMARY_TOKEN_BUDGET
     ) -> None:
 
         self.scaffold = ChartScaffold()
+        self.encoder = SummaryEncoder(token_budget)
+        self.pruner = FieldPruner()
 
     def generate(self, summary: Dict, goal: Goal,
-                 textgen_config: TextGenerationConfig, text_gen: TextGenerator, library='altair'):
-        """Generate visualization code given a summary and a goal"""
+                 textgen_config: TextGenerationConfig, text_gen: TextGenerator, library='altair',
+                 backend: str = "pandas", data: pd.DataFrame = None):
+        """Generate visualization code given a summary and a goal, sending only the fields the goal needs.
+        With data, fields correlated with the fields named in the goal are sent as well."""
 
-        library_template, library_instructions = self.scaffold.get_template(goal, library)
+        library_template, library_instructions = self.scaffold.get_template(goal, library, backend)
+        summary_text = self.encoder.encode(self.pruner.prune(summary, goal, data), textgen_config.model)
         messages = [
             {"role": "system", "content": system_prompt},
-            {"role": "system", "content": f"The dataset summary is : {summary}, and the visualization type is {goal.visualization} \n\n"},
+            {"role": "system", "content": f"The dataset summary is : {summary_text}, and the visualization type is {goal.visualization} \n\n"},
             library_instructions,
             {"role": "user",
              "content":
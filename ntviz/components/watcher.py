@@ -0,0 +1,228 @@
+import hashlib
+import logging
+import os
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from ntviz.datacache import file_fingerprint, hash_rows, load_cached_json, save_cached_json
+from ntviz.utils import materialize_dataframe, read_dataframe
+from .partitions import PartitionedDataset, detect_partition_column
+from .query import QueryEngine
+
+logger = logging.getLogger("ntviz")
+
+WATCHED_EXTENSIONS = ("csv", "tsv", "json", "parquet", "feather", "xls", "xlsx")
+
+
+class DatasetWatcher(object):
+    """Watch a dataset folder and re-execute the stored chart code of files that change"""
+
+    def __init__(self, manager: Any, folder: str, max_rows: int = 4500) -> None:
+        """
+        Initialize the watcher, taking a snapshot of the files that are not known yet.
+
+        Args:
+            manager (Manager): The manager used to execute the chart code.
+            folder (str): The folder holding the datasets.
+            max_rows (int, optional): Rows sampled from a changed file to draw charts with. Defaults to 4500.
+        """
+        self.manager = manager
+        self.folder = folder
+        self.max_rows = max_rows
+        # stored chart code per file, added with add_charts
+        self.charts: Dict[str, List[dict]] = {}
+        self.states: Dict[str, dict] = {}
+        for file_location in self.files():
+            self.states[file_location] = self.load_state(file_location) or self.snapshot(file_location)[0]
+
+    def files(self) -> List[str]:
+        """The dataset files in the watched folder"""
+        return sorted(
+            os.path.join(self.folder, name) for name in os.listdir(self.folder)
+            if name.split(".")[-1] in WATCHED_EXTENSIONS and os.path.isfile(os.path.join(self.folder, name)))
+
+    @staticmethod
+    def _state_key(file_location: str) -> str:
+        return hashlib.md5(os.path.abspath(file_location).encode("utf-8")).hexdigest()
+
+    def load_state(self, file_location: str) -> Optional[dict]:
+        """Load the fingerprint of a file stored by a previous watcher"""
+        return load_cached_json(self._state_key(file_location), namespace="watch")
+
+    def snapshot(self, file_location: str) -> tuple:
+        """
+        Read all rows of a file and fingerprint its schema, rows and columns.
+
+        Returns:
+            tuple: The state of the file and its data.
+        """
+        df = read_dataframe(file_location, max_rows=None)
+        row_hashes = hash_rows(df)
+        state = {
+            # taken after reading, which may rewrite the file with cleaned column names
+            "fingerprint": file_fingerprint(file_location),
+            "schema": {str(column): str(dtype) for column, dtype in df.dtypes.items()},
+            "n_rows": len(df),
+            "rows_digest": hashlib.md5(row_hashes.values.tobytes()).hexdigest(),
+            "columns_digest": {
+                str(column): hashlib.md5(pd.util.hash_pandas_object(df[column], index=False).values.tobytes()).hexdigest()
+                for column in df.columns},
+        }
+        save_cached_json(self._state_key(file_location), state, namespace="watch")
+        return state, df
+
+    def add_charts(self, file_location: str, summary: Any, charts: List[Any], library: str = "seaborn",
+                   backend: Optional[str] = None, partition_column: Optional[str] = None) -> None:
+        """
+        Store the code of charts drawn from a file so they are refreshed when the file changes.
+
+        Args:
+            file_location (str): The dataset file the charts were drawn from.
+            summary (Summary): The summary of the dataset.
+            charts (List[Union[ChartExecutorResponse, str]]): The charts, or their code.
+            library (str, optional): Library of the chart code. Defaults to "seaborn".
+            backend (str, optional): Backend the chart code was generated for. Defaults to the backend
+                of the manager's last summary.
+            partition_column (str, optional): Column to partition on with the "partitioned" backend.
+                Defaults to the column of the manager's partitions, or else the detected column.
+        """
+        file_location = os.path.join(self.folder, os.path.basename(file_location))
+        if backend is None:
+            backend = getattr(self.manager, "backend", None) or "pandas"
+            partitions = getattr(self.manager, "partitions", None)
+            if partition_column is None and partitions is not None:
+                partition_column = partitions.partition_column
+        for chart in charts:
+            code = chart if isinstance(chart, str) else chart.code
+            self.charts.setdefault(file_location, []).append({
+                "code": code,
+                "library": library if isinstance(chart, str) else chart.library,
+                "summary": summary,
+                "columns": self.referenced_columns(code, summary),
+                "backend": backend,
+                "partition_column": partition_column,
+            })
+
+    @staticmethod
+    def referenced_columns(code: str, summary: Any) -> Optional[List[str]]:
+        """The dataset columns quoted in chart code, or None if it references none by name"""
+        field_names = summary.get("field_names") if isinstance(summary, dict) else getattr(summary, "field_names", [])
+        columns = [column for column in field_names or []
+                   if re.search(r"""['"]{}['"]""".format(re.escape(str(column))), code)]
+        return columns or None
+
+    def diff(self, old: dict, new: dict) -> dict:
+        """
+        Compare two states of a file.
+
+        Returns:
+            dict: {"change": "unchanged" | "append" | "update" | "schema", "changed_columns": [...]}
+        """
+        if old["schema"] != new["schema"]:
+            return {"change": "schema", "changed_columns": sorted(set(old["schema"]) ^ set(new["schema"]))}
+        changed_columns = [column for column, digest in new["columns_digest"].items()
+                           if old["columns_digest"].get(column) != digest]
+        if not changed_columns:
+            return {"change": "unchanged", "changed_columns": []}
+        return {"change": "update", "changed_columns": changed_columns}
+
+    def poll(self) -> List[dict]:
+        """
+        Check the folder once. Charts of a changed file whose columns changed are re-executed on the
+        new data without any LLM call. A schema change only reports the file, as its summary, goals
+        and charts have to be generated again.
+
+        Returns:
+            List[dict]: One event per new or changed file, with the file, the change, the changed columns
+                and the refreshed charts.
+        """
+        events = []
+        for file_location in self.files():
+            old = self.states.get(file_location)
+            if old is not None and old["fingerprint"] == file_fingerprint(file_location):
+                continue
+            new, df = self.snapshot(file_location)
+            self.states[file_location] = new
+            if old is None:
+                events.append({"file": file_location, "change": "new", "changed_columns": [], "charts": []})
+                continue
+
+            event = {"file": file_location, **self.diff(old, new), "charts": []}
+            if event["change"] == "unchanged":
+                continue
+            if event["change"] == "update" and new["n_rows"] > old["n_rows"]:
+                prefix_digest = hashlib.md5(hash_rows(df.iloc[:old["n_rows"]]).values.tobytes()).hexdigest()
+                if prefix_digest == old["rows_digest"]:
+                    event["change"] = "append"
+
+            if event["change"] == "schema":
+                logger.info(f"Schema of {file_location} changed, it has to be summarized again")
+            else:
+                event["charts"] = self.refresh(file_location, df, event["changed_columns"])
+            events.append(event)
+        return events
+
+    @staticmethod
+    def helpers(file_location: str, df: pd.DataFrame, chart: dict) -> dict:
+        """
+        Build the sql() or scan() helper of a chart's backend over all rows of its file, so the chart
+        never queries the dataset the manager summarized last.
+
+        Returns:
+            dict: The helpers to execute the chart code with.
+        """
+        if chart["backend"] == "duckdb":
+            return {"sql": QueryEngine(df).sql}
+        if chart["backend"] == "partitioned":
+            full_data = materialize_dataframe(df, chart["summary"])
+            partition_column = chart["partition_column"] or detect_partition_column(full_data, chart["summary"])
+            if partition_column is not None:
+                partitions = PartitionedDataset(full_data, partition_column, key=file_fingerprint(file_location))
+                return {"scan": partitions.scan}
+            logger.warning(f"No column to partition {file_location} on, its charts run without scan()")
+        return {}
+
+    def refresh(self, file_location: str, df: pd.DataFrame, changed_columns: List[str]) -> List[Any]:
+        """Re-execute the stored charts of a file that use a changed column, with the helpers and backend
+        of each chart built for that file"""
+        charts = [chart for chart in self.charts.get(file_location, [])
+                  if chart["columns"] is None or set(chart["columns"]) & set(changed_columns)]
+        if not charts:
+            return []
+        data = df.sample(self.max_rows) if self.max_rows is not None and len(df) > self.max_rows else df
+        logger.info(f"Refreshing {len(charts)} charts of {file_location}")
+        refreshed, helpers = [], {}
+        for chart in charts:
+            key = (chart["backend"], chart["partition_column"])
+            if key not in helpers:
+                # charts of the same backend share one query engine or partitioning
+                helpers[key] = self.helpers(file_location, df, chart)
+            refreshed.extend(self.manager.executor.execute(
+                code_specs=[chart["code"]], data=materialize_dataframe(data, chart["summary"]),
+                summary=chart["summary"], library=chart["library"], return_error=True,
+                helpers=helpers[key], backend=chart["backend"]))
+        return refreshed
+
+    def watch(self, interval: float = 5.0, callback: Optional[Callable[[dict], Any]] = None,
+              max_polls: Optional[int] = None) -> None:
+        """
+        Poll the folder every interval seconds and hand each event to the callback.
+
+        Args:
+            interval (float, optional): Seconds between polls. Defaults to 5.0.
+            callback (Callable[[dict], Any], optional): Called with every event. Defaults to logging it.
+            max_polls (int, optional): Stop after this many polls. Defaults to None (watch forever).
+        """
+        polls = 0
+        while max_polls is None or polls < max_polls:
+            for event in self.poll():
+                if callback is not None:
+                    callback(event)
+                else:
+                    logger.info(f"{event['file']}: {event['change']}, refreshed {len(event['charts'])} charts")
+            polls += 1
+            if max_polls is None or polls < max_polls:
+                time.sleep(interval)
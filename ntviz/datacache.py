@@ -0,0 +1,294 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import time
+from typing import Any, Optional
+
+import pandas as pd
+
+logger = logging.getLogger("ntviz")
+
+# content hashes of files by file_fingerprint, so an unchanged file is only read once per process
+_content_hashes = {}
+# seconds between two scans of the cache for entries to prune
+PRUNE_INTERVAL = 60
+_last_prune = 0.0
+
+
+def get_cache_dir(*parts: str) -> str:
+    """
+    Get (and create) a directory inside the ntviz cache.
+    The cache root can be overridden with the NTVIZ_CACHE_DIR environment variable, and its size is
+    capped by NTVIZ_CACHE_MAX_MB (see prune_cache).
+
+    :param parts: Optional sub-directories below the cache root.
+    :return: The absolute path to the cache directory.
+    """
+    path = os.path.join(_cache_root(), *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _cache_root() -> str:
+    return os.environ.get("NTVIZ_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "ntviz"))
+
+
+def _entry_size(path: str) -> int:
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(folder, name))
+               for folder, _, names in os.walk(path) for name in names)
+
+
+def _touch(path: str) -> None:
+    # entries are pruned by modification time, so reading one marks it as recently used
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def prune_cache(max_bytes: Optional[int] = None) -> int:
+    """
+    Remove the least recently used cache entries (files, or directories such as partitioned datasets)
+    until the cache fits max_bytes. Entries are ordered by modification time, which loads refresh.
+
+    :param max_bytes: Size to prune the cache to. Defaults to the NTVIZ_CACHE_MAX_MB environment
+        variable, 1024 MB if it is not set.
+    :return: The number of removed entries.
+    """
+    if max_bytes is None:
+        max_bytes = int(os.environ.get("NTVIZ_CACHE_MAX_MB", "1024")) * 1024 * 1024
+    root = _cache_root()
+    if not os.path.isdir(root):
+        return 0
+
+    entries = []
+    for namespace in os.listdir(root):
+        folder = os.path.join(root, namespace)
+        if not os.path.isdir(folder):
+            continue
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            if name.endswith(".tmp"):
+                # being written
+                continue
+            try:
+                entries.append((os.stat(path).st_mtime, _entry_size(path), path))
+            except OSError:
+                # removed by another process in the meantime
+                continue
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except OSError as e:
+            logger.warning(f"Failed to prune cache entry {path}. Error: {e}")
+            continue
+        total -= size
+        removed += 1
+    if removed:
+        logger.info(f"Pruned {removed} cache entries, the cache now takes {total / 1024 / 1024:.1f} MB")
+    return removed
+
+
+def maybe_prune_cache() -> None:
+    """Prune the cache after a write, at most once every PRUNE_INTERVAL seconds"""
+    global _last_prune
+    now = time.monotonic()
+    if now - _last_prune < PRUNE_INTERVAL:
+        return
+    _last_prune = now
+    prune_cache()
+
+
+def file_fingerprint(file_location: str, **params: Any) -> str:
+    """
+    Compute a cheap fingerprint of a file from its path, size and modification time.
+    Extra keyword arguments (e.g. the sheet that was parsed) are folded into the fingerprint.
+
+    :param file_location: The path to the file.
+    :param params: Additional JSON serializable parameters that identify the parsed view of the file.
+    :return: A hex digest identifying the file and parameters.
+    """
+    stat = os.stat(file_location)
+    key = {
+        "path": os.path.abspath(file_location),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "params": params,
+    }
+    return hashlib.md5(json.dumps(key, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def file_content_hash(file_location: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Compute the sha256 of the content of a file, streamed in fixed-size chunks. The hash does not
+    depend on the path or modification time, so copies and re-saves of the same data share it.
+
+    :param file_location: The path to the file.
+    :param chunk_size: Number of bytes to read per chunk.
+    :return: The sha256 hex digest of the content.
+    """
+    fingerprint = file_fingerprint(file_location)
+    if fingerprint not in _content_hashes:
+        content_hash = hashlib.sha256()
+        with open(file_location, "rb") as file_object:
+            for chunk in iter(lambda: file_object.read(chunk_size), b""):
+                content_hash.update(chunk)
+        _content_hashes[fingerprint] = content_hash.hexdigest()
+    return _content_hashes[fingerprint]
+
+
+def load_cached_frame(key: str) -> Optional[pd.DataFrame]:
+    """
+    Load a DataFrame from the columnar cache.
+
+    :param key: The fingerprint the DataFrame was stored under.
+    :return: The cached DataFrame, or None if it is not cached.
+    """
+    path = os.path.join(get_cache_dir("frames"), f"{key}.parquet")
+    if not os.path.exists(path):
+        return None
+    try:
+        df = pd.read_parquet(path)
+        _touch(path)
+        return df
+    except Exception as e:
+        logger.warning(f"Failed to read cached frame {path}. Error: {e}")
+        return None
+
+
+def save_cached_frame(key: str, df: pd.DataFrame) -> bool:
+    """
+    Store a DataFrame in the columnar cache as parquet.
+
+    :param key: The fingerprint to store the DataFrame under.
+    :param df: The DataFrame to store.
+    :return: True if the DataFrame was cached.
+    """
+    path = os.path.join(get_cache_dir("frames"), f"{key}.parquet")
+    tmp_path = f"{path}.tmp"
+    try:
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+        maybe_prune_cache()
+        return True
+    except Exception as e:
+        # mixed-type object columns or a missing parquet engine should not break reading
+        logger.warning(f"Failed to cache frame {path}. Error: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+
+def load_cached_json(key: str, namespace: str = "json") -> Optional[Any]:
+    """
+    Load a JSON document from the cache.
+
+    :param key: The key the document was stored under.
+    :param namespace: The cache sub-directory holding the document.
+    :return: The cached document, or None if it is not cached.
+    """
+    path = os.path.join(get_cache_dir(namespace), f"{key}.json")
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as file_object:
+            value = json.load(file_object)
+        _touch(path)
+        return value
+    except (OSError, json.decoder.JSONDecodeError) as e:
+        logger.warning(f"Failed to read cached document {path}. Error: {e}")
+        return None
+
+
+def save_cached_json(key: str, value: Any, namespace: str = "json") -> None:
+    """
+    Store a JSON serializable document in the cache.
+    Values that are not JSON serializable (e.g. timestamps) are stored as strings.
+
+    :param key: The key to store the document under.
+    :param value: The document to store.
+    :param namespace: The cache sub-directory to store the document in.
+    """
+    path = os.path.join(get_cache_dir(namespace), f"{key}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file_object:
+        json.dump(value, file_object, default=str)
+    os.replace(tmp_path, path)
+    maybe_prune_cache()
+
+
+def load_cached_object(key: str, namespace: str = "objects") -> Optional[Any]:
+    """
+    Load a pickled Python object from the cache.
+
+    :param key: The key the object was stored under.
+    :param namespace: The cache sub-directory holding the object.
+    :return: The cached object, or None if it is not cached.
+    """
+    path = os.path.join(get_cache_dir(namespace), f"{key}.pkl")
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as file_object:
+            value = pickle.load(file_object)
+        _touch(path)
+        return value
+    except Exception as e:
+        # e.g. an object pickled by an older version of its class
+        logger.warning(f"Failed to read cached object {path}. Error: {e}")
+        return None
+
+
+def save_cached_object(key: str, value: Any, namespace: str = "objects") -> None:
+    """
+    Store a picklable Python object in the cache.
+
+    :param key: The key to store the object under.
+    :param value: The object to store.
+    :param namespace: The cache sub-directory to store the object in.
+    """
+    path = os.path.join(get_cache_dir(namespace), f"{key}.pkl")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file_object:
+        pickle.dump(value, file_object)
+    os.replace(tmp_path, path)
+    maybe_prune_cache()
+
+
+def hash_rows(df: pd.DataFrame) -> pd.Series:
+    """
+    Hash every row of a DataFrame in one vectorized pass.
+
+    :param df: The DataFrame to hash.
+    :return: A uint64 Series with one hash per row.
+    """
+    return pd.util.hash_pandas_object(df, index=False)
+
+
+def dataframe_fingerprint(df: pd.DataFrame, row_hashes: Optional[pd.Series] = None) -> str:
+    """
+    Compute a fingerprint of the content of a DataFrame (columns, dtypes and values).
+
+    :param df: The DataFrame to fingerprint.
+    :param row_hashes: Row hashes of df from hash_rows, computed if not given.
+    :return: A hex digest identifying the content.
+    """
+    if row_hashes is None:
+        row_hashes = hash_rows(df)
+    digest = hashlib.md5()
+    digest.update(json.dumps([[str(column), str(dtype)] for column, dtype in df.dtypes.items()]).encode("utf-8"))
+    digest.update(row_hashes.values.tobytes())
+    return digest.hexdigest()
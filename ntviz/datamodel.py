@@ -60,6 +60,9 @@ class Summary:
     dataset_description: str
     field_names: List[Any]
     fields: Optional[List[Any]] = None
+    n_rows: Optional[int] = None  # rows in the full dataset
+    sample_size: Optional[int] = None  # rows in the data used for plotting
+    unenriched: Optional[Dict[str, Any]] = None  # descriptions the LLM failed to generate, retried later
 
     def _repr_markdown_(self):
         field_lines = "\n".join([f"- **{name}:** {field}" for name,
@@ -73,6 +76,8 @@ class Summary:
 
 **File Name:** {self.file_name}
 
+**Rows:** {self.n_rows} ({self.sample_size} sampled)
+
 **Dataset Description:**
 
 {self.dataset_description}
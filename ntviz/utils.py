@@ -1,9 +1,11 @@
 import base64
+from datetime import datetime
 import json
 import logging
-from typing import Any, List, Tuple, Union
+from typing import Any, List, Optional, Tuple, Union
 import os
 import io
+import threading
 import numpy as np
 import pandas as pd
 import re
@@ -11,7 +13,9 @@ import matplotlib.pyplot as plt
 import tiktoken
 from diskcache import Cache
 import hashlib
-import io
+import warnings
+import requests
+from .datacache import file_fingerprint, load_cached_frame, save_cached_frame, load_cached_json, save_cached_json
 
 logger = logging.getLogger("ntviz")
 
@@ -42,13 +46,221 @@ def clean_column_names(df: pd.DataFrame) -> pd.DataFrame:
     return cleaned_df
 
 
-def read_dataframe(file_location: str, encoding: str = 'utf-8') -> pd.DataFrame:
+# formats tried on a sample of a string column before falling back to pandas format inference
+DATE_FORMATS = [
+    "%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S.%f",
+    "%Y-%m-%dT%H:%M:%SZ", "%Y/%m/%d", "%Y-%m", "%m/%d/%Y", "%d/%m/%Y", "%m/%d/%y", "%d/%m/%y",
+    "%m/%d/%Y %H:%M", "%m/%d/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y %H:%M:%S", "%d-%m-%Y", "%d.%m.%Y", "%b %d, %Y", "%B %d, %Y",
+    "%d %b %Y", "%d %B %Y", "%d-%b-%Y", "%d-%b-%y", "%b-%y", "%b %Y", "%B %Y",
+]
+# date formats found for each shape of sampled values, e.g. "0000-00-00" -> ["%Y-%m-%d"]. Shapes without
+# a format (free text) are not cached, and the oldest shapes are dropped past MAX_DATE_SHAPES.
+MAX_DATE_SHAPES = 256
+_date_format_cache = {}
+
+
+def _date_shape(values: pd.Series) -> str:
+    return "|".join(sorted({re.sub(r"[0-9]", "0", value) for value in values}))
+
+
+def _matches_format(values: pd.Series, date_format: Optional[str]) -> bool:
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            pd.to_datetime(values, format=date_format, errors='raise')
+        return True
+    except (ValueError, TypeError, OverflowError):
+        return False
+
+
+def _candidate_formats(values: pd.Series) -> List[str]:
+    first_value = values.iloc[0]
+    candidates = []
+    for date_format in DATE_FORMATS:
+        # a scalar strptime on one value rules most formats out before parsing the sample
+        try:
+            datetime.strptime(first_value, date_format)
+        except ValueError:
+            continue
+        if _matches_format(values, date_format):
+            candidates.append(date_format)
+    return candidates
+
+
+def detect_dates(series: pd.Series, n_samples: int = 20) -> Tuple[bool, Optional[str]]:
+    """
+    Check whether a column holds dates. A small sample is tested against known formats first (the
+    formats found are cached per shape of date-like values), and only a column whose sample parses is
+    validated in full, with an explicit format when one was found.
+
+    :param series: The column to check.
+    :param n_samples: Number of distinct non-null values to test before parsing the full column.
+    :return: A tuple of whether the column holds dates and its date format, None if the format was inferred.
+    """
+    # spread the sample over the column, so e.g. days above 12 tell day-first from month-first dates
+    positions = np.unique(np.linspace(0, len(series) - 1, num=min(len(series), 5 * n_samples)).astype(int))
+    values = series.iloc[positions].dropna()
+    if values.empty:
+        # mostly missing columns
+        values = series.dropna()
+    values = values.drop_duplicates().head(n_samples)
+    if values.empty:
+        return False, None
+
+    candidates = []
+    if all(isinstance(value, str) for value in values):
+        shape = _date_shape(values)
+        formats = _date_format_cache.get(shape)
+        if formats is None:
+            formats = _candidate_formats(values)
+            if formats:
+                if len(_date_format_cache) >= MAX_DATE_SHAPES:
+                    _date_format_cache.pop(next(iter(_date_format_cache)))
+                _date_format_cache[shape] = formats
+        candidates = [fmt for fmt in formats if _matches_format(values, fmt)]
+        if not candidates and not _matches_format(values, None):
+            # free text fails here without parsing the full column
+            return False, None
+
+    for date_format in candidates:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            parsed = pd.to_datetime(series, format=date_format, errors='coerce')
+        if parsed.notna().sum() == series.notna().sum():
+            return True, date_format
+
+    # mixed formats, or a format that is not in DATE_FORMATS
+    return _matches_format(series, None), None
+
+
+def compact_dataframe(df: pd.DataFrame, category_threshold: float = 0.5) -> Tuple[pd.DataFrame, int]:
+    """
+    Reduce the memory footprint of a DataFrame.
+    Float columns are downcast to float32 when that is lossless, and string columns with
+    a low ratio of unique values (that are not dates) are converted to category.
+    Integer columns keep their 64-bit type, as arithmetic on smaller integers in generated code
+    overflows silently (e.g. the product of two int16 columns).
+
+    :param df: The DataFrame to compact.
+    :param category_threshold: Maximum ratio of unique values to rows for a string column to become a category.
+    :return: A tuple of the compacted DataFrame and the number of bytes saved.
+    """
+    bytes_before = int(df.memory_usage(deep=True).sum())
+    compacted_df = df.copy()
+
+    for column in compacted_df.columns:
+        series = compacted_df[column]
+        if pd.api.types.is_bool_dtype(series) or pd.api.types.is_integer_dtype(series):
+            continue
+        if pd.api.types.is_float_dtype(series):
+            downcast = series.astype('float32')
+            if downcast.astype(series.dtype).equals(series):
+                compacted_df[column] = downcast
+        elif series.dtype == object and len(series) > 0:
+            if series.nunique() / len(series) < category_threshold and not detect_dates(series)[0]:
+                compacted_df[column] = series.astype('category')
+
+    bytes_saved = bytes_before - int(compacted_df.memory_usage(deep=True).sum())
+    return compacted_df, bytes_saved
+
+
+def _parse_cell_range(cell_range: str) -> dict:
+    """
+    Convert an Excel style cell range (e.g. "B3:F200" or "B3:F") into pandas read_excel arguments.
+
+    :param cell_range: The cell range to read.
+    :return: A dictionary with usecols, skiprows and nrows.
+    """
+    match = re.fullmatch(r'([A-Za-z]+)(\d*):([A-Za-z]+)(\d*)', cell_range.strip())
+    if not match:
+        raise ValueError(f'Invalid cell range: {cell_range}')
+    first_col, first_row, last_col, last_row = match.groups()
+    first_row = int(first_row) if first_row else 1
+    range_kwargs = {"usecols": f"{first_col.upper()}:{last_col.upper()}", "skiprows": first_row - 1}
+    if last_row:
+        range_kwargs["nrows"] = int(last_row) - first_row + 1
+    return range_kwargs
+
+
+def _detect_header_row(df: pd.DataFrame, max_rows: int = 20) -> int:
+    """
+    Find the header row of a sheet read without a header.
+    The header is the first row whose cells are all text and that is as wide as the widest
+    row in the preview, which skips title and note rows above the table.
+
+    :param df: The sheet read with header=None.
+    :param max_rows: Number of leading rows to inspect.
+    :return: The position of the header row.
+    """
+    preview = df.head(max_rows)
+    if preview.empty:
+        return 0
+    widest = preview.notnull().sum(axis=1).max()
+    for position, (_, row) in enumerate(preview.iterrows()):
+        values = row.dropna()
+        if len(values) == widest and all(isinstance(value, str) for value in values):
+            return position
+    return 0
+
+
+def read_excel(file_location: str, sheet_name: Union[str, int] = 0,
+               cell_range: str = None, header_row: int = None) -> pd.DataFrame:
+    """
+    Read a single sheet of an Excel workbook.
+    The fast calamine engine is used when python-calamine is installed. The sheet is parsed once
+    and stored in the columnar cache, so later reads of the same sheet never parse the workbook again.
+
+    :param file_location: The path to the workbook.
+    :param sheet_name: The sheet name or position to read.
+    :param cell_range: Optional cell range to read, e.g. "B3:F200".
+    :param header_row: Position of the header row within the range. Detected automatically if None.
+    :return: The parsed sheet.
+    """
+    cache_key = file_fingerprint(file_location, sheet_name=sheet_name,
+                                 cell_range=cell_range, header_row=header_row)
+    df = load_cached_frame(cache_key)
+    if df is not None:
+        return df
+
+    try:
+        import python_calamine  # noqa: F401
+        engine = "calamine"
+    except ImportError:
+        engine = None
+
+    range_kwargs = _parse_cell_range(cell_range) if cell_range else {}
+    raw_df = pd.read_excel(file_location, sheet_name=sheet_name, header=None,
+                           engine=engine, **range_kwargs)
+
+    if header_row is None:
+        header_row = _detect_header_row(raw_df)
+    header = raw_df.iloc[header_row]
+    df = raw_df.iloc[header_row + 1:].reset_index(drop=True)
+    df.columns = [str(value) if pd.notnull(value) else f"column_{i}"
+                  for i, value in enumerate(header)]
+    df = df.dropna(how="all").reset_index(drop=True).infer_objects()
+
+    save_cached_frame(cache_key, df)
+    return df
+
+
+# rows of a file kept in memory to profile and draw charts from
+MAX_SAMPLE_ROWS = 4500
+
+
+def read_dataframe(file_location: str, encoding: str = 'utf-8', compact: bool = False,
+                   sheet_name: Union[str, int] = 0, cell_range: str = None,
+                   max_rows: Optional[int] = MAX_SAMPLE_ROWS) -> pd.DataFrame:
     """
     Read a dataframe from a given file location and clean its column names.
-    It also samples down to 4500 rows if the data exceeds that limit.
+    It also samples down to max_rows rows (4500 by default) if the data exceeds that limit.
 
     :param file_location: The path to the file containing the data.
     :param encoding: Encoding to use for the file reading.
+    :param compact: Whether to downcast float columns and convert low-cardinality strings to category.
+    :param sheet_name: The sheet to read from Excel workbooks.
+    :param cell_range: Optional cell range to read from Excel workbooks, e.g. "B3:F200".
+    :param max_rows: Maximum number of rows to keep. No sampling if None.
     :return: A cleaned DataFrame.
     """
     file_extension = file_location.split('.')[-1]
@@ -56,10 +268,10 @@ def read_dataframe(file_location: str, encoding: str = 'utf-8') -> pd.DataFrame:
     read_funcs = {
         'json': lambda: pd.read_json(file_location, orient='records', encoding=encoding),
         'csv': lambda: pd.read_csv(file_location, encoding=encoding),
-        'xls': lambda: pd.read_excel(file_location, encoding=encoding),
-        'xlsx': lambda: pd.read_excel(file_location, encoding=encoding),
-        'parquet': pd.read_parquet,
-        'feather': pd.read_feather,
+        'xls': lambda: read_excel(file_location, sheet_name=sheet_name, cell_range=cell_range),
+        'xlsx': lambda: read_excel(file_location, sheet_name=sheet_name, cell_range=cell_range),
+        'parquet': lambda: pd.read_parquet(file_location),
+        'feather': lambda: pd.read_feather(file_location),
         'tsv': lambda: pd.read_csv(file_location, sep="\t", encoding=encoding)
     }
 
@@ -75,17 +287,10 @@ def read_dataframe(file_location: str, encoding: str = 'utf-8') -> pd.DataFrame:
     # Clean column names
     cleaned_df = clean_column_names(df)
 
-    # Sample down to 4500 rows if necessary
-    if len(cleaned_df) > 4500:
-        logger.info(
-            "Dataframe has more than 4500 rows. We will sample 4500 rows.")
-        cleaned_df = cleaned_df.sample(4500)
-
-    if cleaned_df.columns.tolist() != df.columns.tolist():
+    # Excel sheets are not written back, the cleaned sheet lives in the columnar cache
+    if cleaned_df.columns.tolist() != df.columns.tolist() and file_extension not in ('xls', 'xlsx'):
         write_funcs = {
             'csv': lambda: cleaned_df.to_csv(file_location, index=False, encoding=encoding),
-            'xls': lambda: cleaned_df.to_excel(file_location, index=False),
-            'xlsx': lambda: cleaned_df.to_excel(file_location, index=False),
             'parquet': lambda: cleaned_df.to_parquet(file_location, index=False),
             'feather': lambda: cleaned_df.to_feather(file_location, index=False),
             'json': lambda: cleaned_df.to_json(file_location, orient='records', index=False, default_handler=str),
@@ -101,9 +306,150 @@ def read_dataframe(file_location: str, encoding: str = 'utf-8') -> pd.DataFrame:
             logger.error(f"Failed to write file: {file_location}. Error: {e}")
             raise
 
+    # Sample down (after writing back, so the file keeps all rows) to max_rows rows if necessary
+    if max_rows is not None and len(cleaned_df) > max_rows:
+        logger.info(
+            f"Dataframe has more than {max_rows} rows. We will sample {max_rows} rows.")
+        cleaned_df = cleaned_df.sample(max_rows)
+
+    if compact:
+        cleaned_df, bytes_saved = compact_dataframe(cleaned_df)
+        logger.info(f"Compacted dataframe from {file_location}, saved {bytes_saved} bytes.")
+
     return cleaned_df
 
 
+class FileTooLargeError(ValueError):
+    """Raised when a streamed file exceeds the allowed size"""
+
+
+def stream_to_file(source: Any, file_location: str, chunk_size: int = 1024 * 1024,
+                   max_bytes: int = None) -> str:
+    """
+    Stream a file-like object to disk in fixed-size chunks, hashing the content on the way.
+    The partially written file is removed if the size limit is exceeded.
+
+    :param source: A binary file-like object with a read(size) method, or an iterable of byte chunks.
+    :param file_location: The path to write to.
+    :param chunk_size: Number of bytes to read per chunk.
+    :param max_bytes: Maximum number of bytes to accept. No limit if None.
+    :return: The sha256 hex digest of the content.
+    """
+    if hasattr(source, "read"):
+        chunks = iter(lambda: source.read(chunk_size), b"")
+    else:
+        chunks = source
+
+    content_hash = hashlib.sha256()
+    written = 0
+    try:
+        with open(file_location, "wb") as file_object:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                written += len(chunk)
+                if max_bytes is not None and written > max_bytes:
+                    raise FileTooLargeError(
+                        f"File exceeds the maximum allowed size of {max_bytes} bytes")
+                content_hash.update(chunk)
+                file_object.write(chunk)
+    except BaseException:
+        if os.path.exists(file_location):
+            os.remove(file_location)
+        raise
+    return content_hash.hexdigest()
+
+
+def download_file(url: str, file_location: str, chunk_size: int = 1024 * 1024,
+                  max_bytes: int = None, conditional: bool = True, timeout: int = 1000) -> Tuple[str, bool]:
+    """
+    Download a file to disk in fixed-size chunks.
+    The ETag and Last-Modified headers of each download are kept in a local metadata store, and
+    later downloads of the same url are conditional requests, so an unchanged remote file is not
+    downloaded again.
+
+    :param url: The url to download.
+    :param file_location: The path to write to.
+    :param chunk_size: Number of bytes to read per chunk.
+    :param max_bytes: Maximum number of bytes to accept. No limit if None.
+    :param conditional: Whether to send a conditional request when the file was downloaded before.
+    :param timeout: Request timeout in seconds.
+    :return: A tuple of the sha256 hex digest of the content and whether the file was (re)downloaded.
+    """
+    url_key = hashlib.md5(url.encode("utf-8")).hexdigest()
+    metadata = load_cached_json(url_key, namespace="downloads")
+
+    headers = {}
+    if conditional and metadata is not None and os.path.exists(file_location):
+        if metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
+
+    with requests.get(url, headers=headers, stream=True, allow_redirects=True, timeout=timeout) as response:
+        if response.status_code == 304 and headers:
+            return metadata["content_hash"], False
+        response.raise_for_status()
+
+        content_length = response.headers.get("Content-Length")
+        if max_bytes is not None and content_length and int(content_length) > max_bytes:
+            raise FileTooLargeError(f"File exceeds the maximum allowed size of {max_bytes} bytes")
+
+        partial_location = f"{file_location}.part"
+        content_hash = stream_to_file(response.iter_content(chunk_size), partial_location,
+                                      chunk_size=chunk_size, max_bytes=max_bytes)
+        os.replace(partial_location, file_location)
+
+    save_cached_json(url_key, {
+        "url": url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "content_hash": content_hash,
+    }, namespace="downloads")
+    return content_hash, True
+
+
+def get_date_columns(summary: Any) -> List[str]:
+    """
+    Get the columns a data summary marks as dates.
+
+    :param summary: A Summary object or summary dictionary.
+    :return: The names of the date columns.
+    """
+    fields = summary.get("fields") if isinstance(summary, dict) else getattr(summary, "fields", None)
+    return [field["column"] for field in fields or []
+            if field.get("properties", {}).get("dtype") == "date"]
+
+
+def materialize_dataframe(df: pd.DataFrame, summary: Any, sort_by_time: bool = False) -> pd.DataFrame:
+    """
+    Parse the date columns identified in a data summary so generated code receives typed data.
+    Columns that are already datetime64 are left untouched.
+
+    :param df: The DataFrame the summary describes.
+    :param summary: A Summary object or summary dictionary.
+    :param sort_by_time: Whether to sort rows along the primary time column (the date column with the most unique values).
+    :return: The DataFrame with parsed date columns.
+    """
+    date_columns = [column for column in get_date_columns(summary) if column in df.columns]
+    unparsed_columns = [column for column in date_columns
+                        if not pd.api.types.is_datetime64_any_dtype(df[column])]
+    if unparsed_columns:
+        df = df.copy()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for column in unparsed_columns:
+                # an explicit format parses much faster than per-value format inference
+                _, date_format = detect_dates(df[column])
+                df[column] = pd.to_datetime(df[column], format=date_format, errors='coerce')
+
+    if sort_by_time and date_columns:
+        time_column = max(date_columns, key=lambda column: df[column].nunique())
+        if not df[time_column].is_monotonic_increasing:
+            df = df.sort_values(time_column, kind="stable").reset_index(drop=True)
+    return df
+
+
 def file_to_df(file_location: str):
     """ Get summary of data from file location """
     file_name = file_location.split("/")[-1]
@@ -173,6 +519,35 @@ def plot_raster(rasters: Union[str, List[str]], figsize: Tuple[int, int] = (10,
     plt.show()
 
 
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Count the tokens of a text with the tiktoken encoding of a model.
+
+    :param text: The text to count.
+    :param model: The model whose encoding is used. Defaults to cl100k_base, also used for unknown models.
+    :return: The number of tokens, estimated as one per four characters if no encoding can be loaded.
+    """
+    with _encodings_lock:
+        if model not in _encodings:
+            try:
+                try:
+                    _encodings[model] = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+                except KeyError:
+                    _encodings[model] = tiktoken.get_encoding("cl100k_base")
+            except Exception as error:
+                # encodings are downloaded on first use, which fails offline
+                logger.warning(f"Could not load a tiktoken encoding, estimating tokens from characters: {error}")
+                _encodings[model] = None
+    encoding = _encodings[model]
+    if encoding is None:
+        return -(-len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
 def num_tokens_from_messages(messages, model="gpt-3.5-turbo-0301"):
     """Returns the number of tokens used by a list of messages."""
     try:
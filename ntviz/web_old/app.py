@@ -1,7 +1,7 @@
 import json
 import os
 import logging
-import requests
+from urllib.parse import urlparse
 from fastapi import FastAPI, UploadFile
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
@@ -10,12 +10,18 @@ import traceback
 from llmx import llm, providers
 from ..datamodel import GoalWebRequest, SummaryUrlRequest, TextGenerationConfig, UploadUrl, VisualizeEditWebRequest, VisualizeEvalWebRequest, VisualizeExplainWebRequest, VisualizeRecommendRequest, VisualizeRepairWebRequest, VisualizeWebRequest, InfographicsRequest
 from ..components import Manager
+from ..datacache import load_cached_json, save_cached_json
+from ..utils import FileTooLargeError, download_file, stream_to_file
 
 
 # instantiate model and generator
 textgen = llm()
 logger = logging.getLogger("ntviz")
 api_docs = os.environ.get("NTVIZ_API_DOCS", "False") == "True"
+max_upload_bytes = int(os.environ.get("NTVIZ_MAX_UPLOAD_MB", "100")) * 1024 * 1024
+upload_chunk_size = 1024 * 1024
+# shrink the memory of uploaded datasets, off by default as generated code then runs on float32/category columns
+compact_data = os.environ.get("NTVIZ_COMPACT_DATA", "False") == "True"
 
 
 ntviz = Manager(text_gen=textgen)
@@ -46,6 +52,35 @@ app.mount("/", StaticFiles(directory=static_folder_root, html=True), name="ui")
 api.mount("/files", StaticFiles(directory=files_static_root, html=True), name="files")
 
 
+def load_stored_summary(content_hash: str, textgen_config: TextGenerationConfig):
+    """Return the stored summary for some file content if its data file is unchanged, with the data
+    file loaded back into the manager"""
+    cached = load_cached_json(content_hash, namespace="uploads")
+    if cached is None:
+        return None
+    cached_location = os.path.join(data_folder, cached["data_filename"])
+    if not os.path.exists(cached_location) or os.stat(cached_location).st_mtime_ns != cached["mtime"]:
+        return None
+    # charts for this summary are executed against the stored data file, and the data, query engine and
+    # helpers of the previous upload are replaced. The summary itself comes from the summary cache.
+    summary = ntviz.summarize(
+        data=cached_location,
+        file_name=cached["data_filename"],
+        summary_method="llm",
+        textgen_config=textgen_config,
+        compact=compact_data,
+        use_cache=True)
+    store_summary(content_hash, summary, cached["data_filename"])
+    return {**cached, "summary": summary}
+
+
+def store_summary(content_hash: str, summary: dict, file_name: str):
+    """Store the summary of some file content together with the data file it was computed from"""
+    save_cached_json(content_hash, {
+        "summary": summary, "data_filename": file_name,
+        "mtime": os.stat(os.path.join(data_folder, file_name)).st_mtime_ns}, namespace="uploads")
+
+
 # def check_model
 
 @api.post("/visualize")
@@ -228,7 +263,8 @@ async def generate_goal(req: GoalWebRequest) -> dict:
 async def upload_file(file: UploadFile):
     """ Upload a file and return a summary of the data """
     # allow csv, excel, json
-    allowed_types = ["text/csv", "application/vnd.ms-excel", "application/json"]
+    allowed_types = ["text/csv", "application/vnd.ms-excel",
+                     "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "application/json"]
 
     # print("file: ", file)
     # check file type
@@ -238,20 +274,38 @@ async def upload_file(file: UploadFile):
 
     try:
 
-        # save file to files folder
-        file_location = os.path.join(data_folder, file.filename)
-        # open file without deleting existing contents
-        with open(file_location, "wb+") as file_object:
-            file_object.write(file.file.read())
+        # stream file to a temporary location in the files folder, hashing it on the way
+        file_name = os.path.basename(file.filename)
+        file_location = os.path.join(data_folder, file_name)
+        partial_location = f"{file_location}.part"
+        try:
+            content_hash = stream_to_file(
+                file.file, partial_location, chunk_size=upload_chunk_size, max_bytes=max_upload_bytes)
+        except FileTooLargeError as size_error:
+            return {"status": False, "message": str(size_error)}
+
+        # duplicate upload, reuse the summary if the stored data file has not changed since
+        textgen_config = TextGenerationConfig(n=1, temperature=0)
+        try:
+            cached = load_stored_summary(content_hash, textgen_config)
+            if cached is None:
+                os.replace(partial_location, file_location)
+        finally:
+            if os.path.exists(partial_location):
+                os.remove(partial_location)
+        if cached is not None:
+            return {"status": True, "summary": cached["summary"],
+                    "data_filename": cached["data_filename"]}
 
         # summarize
-        textgen_config = TextGenerationConfig(n=1, temperature=0)
         summary = ntviz.summarize(
             data=file_location,
-            file_name=file.filename,
+            file_name=file_name,
             summary_method="llm",
-            textgen_config=textgen_config)
-        return {"status": True, "summary": summary, "data_filename": file.filename}
+            textgen_config=textgen_config,
+            compact=compact_data)
+        store_summary(content_hash, summary, file_name)
+        return {"status": True, "summary": summary, "data_filename": file_name}
     except Exception as exception_error:
         logger.error(f"Error processing file: {str(exception_error)}")
         return {"status": False, "message": f"Error processing file."}
@@ -264,19 +318,32 @@ async def upload_file_via_url(req: SummaryUrlRequest) -> dict:
     url = req.url
     textgen_config = req.textgen_config if req.textgen_config else TextGenerationConfig(
         n=1, temperature=0)
-    file_name = url.split("/")[-1]
+    file_name = os.path.basename(urlparse(url).path)
     file_location = os.path.join(data_folder, file_name)
 
-    # download file
-    url_response = requests.get(url, allow_redirects=True, timeout=1000)
-    open(file_location, "wb").write(url_response.content)
     try:
+        # download file, skipped when the remote file is unchanged since the last download
+        try:
+            content_hash, downloaded = download_file(
+                url, file_location, chunk_size=upload_chunk_size, max_bytes=max_upload_bytes)
+            if not downloaded:
+                cached = load_stored_summary(content_hash, textgen_config)
+                if cached is not None:
+                    return {"status": True, "summary": cached["summary"],
+                            "data_filename": cached["data_filename"]}
+                content_hash, _ = download_file(
+                    url, file_location, chunk_size=upload_chunk_size, max_bytes=max_upload_bytes,
+                    conditional=False)
+        except FileTooLargeError as size_error:
+            return {"status": False, "message": str(size_error)}
 
         summary = ntviz.summarize(
             data=file_location,
             file_name=file_name,
             summary_method="llm",
-            textgen_config=textgen_config)
+            textgen_config=textgen_config,
+            compact=compact_data)
+        store_summary(content_hash, summary, file_name)
         return {"status": True, "summary": summary, "data_filename": file_name}
     except Exception as exception_error:
         # traceback.print_exc()
@@ -9,6 +9,8 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from ntviz import Manager, TextGenerationConfig, llm
+from ntviz.utils import compact_dataframe
+from ntviz.components import DataCleaner
 
 import seaborn as sns
 import matplotlib.pyplot as plt
@@ -60,6 +62,9 @@ def upload_file():
         if uploaded_file.name.endswith(".csv"):
             # Read CSV file
             df = pd.read_csv(uploaded_file)
+            # Shrink the per-session memory footprint of the dataset, if enabled
+            if os.environ.get("NTVIZ_COMPACT_DATA", "False") == "True":
+                df, _ = compact_dataframe(df)
             st.success(f"Successfully uploaded a CSV file with {len(df)} rows of data.")
         else:
             st.error("This format is not supported.")
@@ -70,26 +75,26 @@ def upload_file():
         return None
 
 
-def clean_df(df):
+def clean_df(df, return_report=False):
     """
     Goal: Automate the data cleaning process for tasks such as replacing missing values and removing duplicates.
     
     Args:
         df (DataFrame): The dataset provided by the user
+        return_report (bool): Also return the report of what was cleaned
 
     Returns:
-        cleaned_df: The cleaned dataset
+        cleaned_df: The cleaned dataset, and the report if return_report
     """
-    df = df.copy()
-    
-    # Fill missing values for numerical columns with the mean value
-    for col in df.select_dtypes(include=['number']).columns:
-        df[col] = df[col].fillna(df[col].mean())
-        
-    # Remove duplicate values
-    df = df.drop_duplicates()
-    
-    return df
+    # Cleaned once per dataset, reruns return the cached result
+    cleaned_df, report = get_cleaner().clean_with_report(df)
+    return (cleaned_df, report) if return_report else cleaned_df
+
+
+@st.cache_resource
+def get_cleaner():
+    """Share one data cleaner (and its cache) across reruns and sessions."""
+    return DataCleaner()
 
 # Convert base64 string to image
 def base64_to_image(base64_str):
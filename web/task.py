@@ -166,11 +166,9 @@ def process_data_summary(df, ntviz, textgen_config):
     st.dataframe(df.head())
     
     # Check and clean data
-    null_values = df.isnull().sum()
-    dup_values = df.duplicated().sum()
-    
-    if null_values.any() > 0 or dup_values > 0:  
-        df = clean_df(df)
+    df, report = clean_df(df, return_report=True)
+
+    if report["missing_values"] > 0 or report["duplicates"] > 0:
         st.success("Data cleaned!")
     else:
         st.success("No missing or duplicate values found in the data.")